@@ -7,17 +7,26 @@ import serial.tools.list_ports
 from collections import deque
 import configparser
 import shutil
-import sys
 import re
+import mmap
+import marshal
+import array
+import tempfile
+import logging
 from tkinter import filedialog, messagebox
 from BeamPilotGui import BeamPilotGui
 
-# External scripts
-FIX_POWER_SCRIPT = "fix_power.py"
-SCALE_GCODE_SCRIPT = "scale_gcode.py"
-OPTIMIZE_GCODE_SCRIPT = "optimize_gcode.py"
-ADJUST_SPEED_SCRIPT = "adj_speed.py"
-ADJUST_POWER_SCRIPT = "adj_power.py"
+# G-code processing scripts, called in-process through their process() functions
+import fix_power
+import scale_gcode
+import optimize_gcode
+import adj_speed
+import adj_power
+
+PROGRAM_NAME = os.path.splitext(os.path.basename(__file__))[0]
+
+# Diagnostics, silent unless the level is lowered to DEBUG
+logger = logging.getLogger(PROGRAM_NAME)
 
 # GRBL Commands
 HOME_CMD = "$H"
@@ -31,24 +40,56 @@ SOFT_RESET = "\x18"  # Ctrl-X for reset/stop
 PAUSE_CMD = "!"  # Feed hold
 RESUME_CMD = "~"  # Cycle resume
 SET_ZERO_CMD = "G92 X0 Y0"
+REALTIME_CMDS = frozenset((STATUS_QUERY, PAUSE_CMD, RESUME_CMD, SOFT_RESET))  # Not stored in the GRBL RX buffer
+# Fixed commands encoded once, send_cmd looks them up instead of encoding on every send.
+# Realtime commands are single bytes without a newline, GRBL acts on them at once and sends no ok
+COMMAND_BYTES = {cmd: (cmd if cmd in REALTIME_CMDS else cmd + "\n").encode() for cmd in
+                 (STATUS_QUERY, PAUSE_CMD, RESUME_CMD, SOFT_RESET, HOME_CMD, UNLOCK_CMD, RETURN_ZERO_CMD, SET_ZERO_CMD)}
+GRBL_RX_BUFFER_SIZE = 127  # Bytes of the 128-byte GRBL serial RX buffer used for streaming
+# Two-character prefixes of commands that may change position (G0/G1/G9x/$H),
+# update_relative_position refines the exact command
+POSITION_CMD_PREFIXES = frozenset(("G0", "G1", "G9", HOME_CMD[:2], RETURN_ZERO_CMD[:2]))
+CONFIG_CACHE_SUFFIX = ".cache"  # Binary snapshot of the parsed INI, next to the INI file
 BUFFER_CHECK_INTERVAL = 0.1  # Seconds to check for sending next line
 POLL_INTERVAL = 1  # Seconds to poll position for real-time updates
+RUN_POLL_INTERVAL = 0.2  # Seconds to poll position while a job is streaming
+SERIAL_READ_TIMEOUT = 0.02  # Seconds a serial read blocks waiting for data
 MAX_POWER = 1000
 MAX_GCODE_LINES = 100000  # Maximum number of G-code lines allowed
 MAX_FILE_SIZE = 10 * 1024 * 1024  # Maximum file size in bytes (10 MB)
-G1_IDLE_RE = re.compile(r'^\s*G1\s+F[\d\.]+.*[XY][+-]?\d+\.?\d*.*$', re.IGNORECASE)
+SENT_COMMANDS_HISTORY = 2048  # Number of sent commands kept in history
+RESPONSE_QUEUE_SIZE = 4096  # Maximum number of pending responses from GRBL
+CMD_MONITOR_FLUSH_INTERVAL = 50  # Milliseconds between command monitor updates
+CMD_MONITOR_MAX_LINES = 2000  # Oldest quarter of the command monitor is dropped beyond this
+RECOLOR_FLUSH_INTERVAL = 33  # Milliseconds between sent path recolors (~30 Hz)
+SENT_PATH_COLOR = "red"  # Color of paths whose G-code lines were sent
+TEMP_FILE_PREFIX = "bp_"  # Prefix of processed G-code files in the system temp directory
+CONFIG_SAVE_DELAY = 500  # Milliseconds to coalesce configuration writes
+COMMENT_PAREN_BYTES_RE = re.compile(rb'\([^)\r\n]*\)')
+COMMENT_SEMI_BYTES_RE = re.compile(rb';[^\r\n]*')
+PARAM_RE = re.compile(r'([A-Z])(-?(?:\d+\.?\d*|\.\d+))')
+
+def strip_comments(line):
+    """Remove '(...)' and ';' comments from a G-code line and strip whitespace"""
+    start = line.find('(')
+    while start != -1:
+        end = line.find(')', start + 1)
+        if end == -1:
+            break
+        line = line[:start] + line[end + 1:]
+        start = line.find('(', start)
+    return line.partition(';')[0].strip()
 
 class GRBLController(BeamPilotGui):
     def __init__(self):
         super().__init__()
-        program_name = os.path.splitext(os.path.basename(__file__))[0]
-        self.title(f"{program_name} - Laser G-code sender")
+        self.title(f"{PROGRAM_NAME} - Laser G-code sender")
         self.geometry("800x600")
 
         self.protocol("WM_DELETE_WINDOW", self.quit_app)
 
         # Load config
-        self.config_file = f'{program_name}.ini'
+        self.config_file = f'{PROGRAM_NAME}.ini'
         self.app_config = configparser.ConfigParser()
         self.load_config()
 
@@ -56,25 +97,39 @@ class GRBLController(BeamPilotGui):
         self.connected = False
         self.ser = None
         self.gcode_lines = []
-        self.sent_lines = set()
+        self.line_bytes = []  # Encoded lines with '\n', built once per loaded program
+        self.line_lens = array.array('I')  # Byte length of each encoded line
+        self.parsed_lines = None  # parse_params() of each line, built on first draw
         self.current_line = 0
         self.running = False
         self.paused = False
-        self.response_queue = deque()
+        self.response_queue = deque(maxlen=RESPONSE_QUEUE_SIZE)
+        self.position_dirty = False  # Position changed since the labels and marker were last drawn
+        self.update_scheduled = False  # update() is already queued on the Tk thread
+        self.status_handlers = {"MPos": self.process_mpos, "WCO:": self.process_wco}
         self.abs_position = (0, 0)
         self.rel_position = (0, 0)
         self.scale_factor = 1.0
         self.offset_x = 0.0
         self.offset_y = 0.0
-        self.drag_start_x = 0
-        self.drag_start_y = 0
+        self.update_affine()
         self.min_x = self.min_y = self.max_x = self.max_y = 0
         self.max_working_speed = 0.0
         self.max_idle_speed = 0.0
         self.max_power = 0.0
-        self.paths = []
-        self.line_to_path = {}
-        self.sent_commands = []
+        self.paths = array.array('I')  # Canvas item ids of drawn paths
+        self.line_to_path = array.array('i')  # Path index per G-code line, -1 if none
+        self.line_segment = bytearray()  # Segment offset of each G-code line within its path
+        self.path_segments = bytearray()  # Segment count per path
+        self.sent_commands = deque(maxlen=SENT_COMMANDS_HISTORY)
+        self.cmd_monitor_pending = []  # Commands waiting to be shown in the command monitor
+        self.cmd_monitor_scheduled = False
+        self.pending_recolor = {}  # Color -> canvas paths waiting to be recolored
+        self.sent_segments = bytearray()  # Leading segments per path already sent since the last redraw
+        self.pending_split = {}  # Path index -> (first, last) sent segments not yet recolored on the canvas
+        self.recolor_scheduled = False
+        self.rx_pending = deque()  # Sizes of lines sent to GRBL and not yet acknowledged
+        self.stream_lock = threading.Lock()  # Guards rx_pending and serial writes only, never held across Tk calls
         self.gcode_loaded = False
         self.display_coords = tk.StringVar(value=self.app_config.get('Settings', 'display_coords', fallback='absolute'))
         self.last_sync_time = time.time()
@@ -82,6 +137,7 @@ class GRBLController(BeamPilotGui):
         self.last_g92_time = 0
         self.current_file = None
         self.temp_files = []
+        self.save_pending = False
         self.power_fix_var = tk.StringVar(value=self.app_config.get('Settings', 'power_fix', fallback="1000"))
         self.max_x_var = tk.StringVar(value=self.app_config.get('Settings', 'max_x', fallback="100"))
         self.max_y_var = tk.StringVar(value=self.app_config.get('Settings', 'max_y', fallback="100"))
@@ -96,15 +152,40 @@ class GRBLController(BeamPilotGui):
 
         # Serial reader thread
         self.serial_thread = None
-        self.poll_thread = None
-        self.receive_buffer = ""  # Buffer for incoming data
+        self.receive_buffer = bytearray()  # Buffer for incoming data
+        self.scan_pos = 0  # Position in receive_buffer where the next scan resumes
+        self.status_start = -1  # Start of an unfinished '<...>' status report, or -1
 
         # Refresh ports on start
         self.refresh_ports()
 
+    def read_config(self):
+        # Use the binary snapshot of the INI when it is not older than the INI itself
+        cache_file = self.config_file + CONFIG_CACHE_SUFFIX
+        try:
+            if os.path.getmtime(self.config_file) <= os.path.getmtime(cache_file):
+                with open(cache_file, 'rb') as f:
+                    self.app_config.read_dict(marshal.load(f))
+                return
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        self.app_config.read(self.config_file)
+        self.write_config_cache()
+
+    def write_config_cache(self):
+        cache_file = self.config_file + CONFIG_CACHE_SUFFIX
+        try:
+            data = {section: dict(self.app_config[section]) for section in self.app_config.sections()}
+            temp_file = cache_file + '.tmp'
+            with open(temp_file, 'wb') as f:
+                marshal.dump(data, f)
+            os.replace(temp_file, cache_file)
+        except Exception as e:
+            print(f"Error writing configuration cache: {e}")
+
     def load_config(self):
         try:
-            self.app_config.read(self.config_file)
+            self.read_config()
             if not self.app_config.has_section('Settings'):
                 self.app_config.add_section('Settings')
             self.last_open_dir = self.app_config.get('Settings', 'last_open_dir', fallback=os.getcwd())
@@ -158,40 +239,43 @@ class GRBLController(BeamPilotGui):
             self.app_config.set('Settings', 'last_command', self.last_command.get())
             with open(self.config_file, 'w') as configfile:
                 self.app_config.write(configfile)
+            self.write_config_cache()
         except Exception as e:
             print(f"Error saving configuration: {e}")
 
+    def schedule_save(self):
+        """Coalesce configuration writes requested in quick succession into one save"""
+        if self.save_pending:
+            return
+        self.save_pending = True
+        self.after(CONFIG_SAVE_DELAY, self.do_save)
+
+    def do_save(self):
+        self.save_pending = False
+        self.save_config()
+
     def parse_params(self, line):
-        params = {}
-        i = 0
-        line = line.upper()
-        while i < len(line):
-            if line[i].isalpha():
-                key = line[i]
-                i += 1
-                value = ''
-                sign = 1
-                if i < len(line) and line[i] == '-':
-                    sign = -1
-                    i += 1
-                while i < len(line) and (line[i].isdigit() or line[i] == '.'):
-                    value += line[i]
-                    i += 1
-                if value:
-                    try:
-                        params[key] = float(value) * sign
-                    except ValueError:
-                        pass
-            else:
-                i += 1
-        return params
+        return self.parse_upper_params(line.upper())
+
+    def parse_upper_params(self, upper):
+        # findall yields (letter, value) tuples without building a match object per word
+        return {letter: float(value) for letter, value in PARAM_RE.findall(upper)}
+
+    def parse_draw_fields(self, line):
+        """Return (first two chars, G, M, X, Y, F, S) of a line for draw_gcode, None for missing words"""
+        upper = line.upper()
+        get = self.parse_upper_params(upper).get
+        return (upper[:2], get('G'), get('M'), get('X'), get('Y'), get('F'), get('S'))
+
+    def update_affine(self):
+        # Model (mm) -> canvas transform, recomputed only when scale or offset change
+        self.affine_ax = 10 * self.scale_factor
+        self.affine_bx = 100 * self.scale_factor + self.offset_x
+        self.affine_ay = -10 * self.scale_factor
+        self.affine_by = 500 * self.scale_factor + self.offset_y
 
     def model_to_canvas(self, mx, my):
-        base_x = mx * 10 + 100
-        base_y = -my * 10 + 500
-        cx = base_x * self.scale_factor + self.offset_x
-        cy = base_y * self.scale_factor + self.offset_y
-        return cx, cy
+        return self.affine_ax * mx + self.affine_bx, self.affine_ay * my + self.affine_by
 
     def refresh_ports(self):
         ports = [p.device for p in serial.tools.list_ports.comports() if not p.device.startswith('/dev/ttyS')]
@@ -213,18 +297,20 @@ class GRBLController(BeamPilotGui):
                 return
                 
             try:
-                self.ser = serial.Serial(port, int(baudrate), timeout=0)  # Non-blocking mode
+                self.ser = serial.Serial(port, int(baudrate), timeout=SERIAL_READ_TIMEOUT)
+                try:
+                    self.ser.set_low_latency_mode(True)  # Linux only, e.g. FTDI/CH340 adapters
+                except Exception:
+                    pass
                 self.connected = True
                 self.connect_btn.config(text="Disconnect")
                 
                 self.last_port = port
                 self.last_baudrate = baudrate
-                self.save_config()
+                self.schedule_save()
                 
                 self.serial_thread = threading.Thread(target=self.serial_reader, daemon=True)
                 self.serial_thread.start()
-                self.poll_thread = threading.Thread(target=self.poll_position, daemon=True)
-                self.poll_thread.start()
                 time.sleep(2)
                 self.send_cmd(STATUS_QUERY, log=False)
             except Exception as e:
@@ -234,8 +320,6 @@ class GRBLController(BeamPilotGui):
             self.connected = False
             if self.serial_thread:
                 self.serial_thread.join(timeout=1.0)
-            if self.poll_thread:
-                self.poll_thread.join(timeout=1.0)
             if self.ser and self.ser.is_open:
                 try:
                     self.ser.close()
@@ -243,7 +327,6 @@ class GRBLController(BeamPilotGui):
                     print(f"Error closing serial port: {e}")
             self.ser = None
             self.serial_thread = None
-            self.poll_thread = None
             self.connect_btn.config(text="Connect")
             self.abs_position = (0, 0)
             self.rel_position = (0, 0)
@@ -253,100 +336,132 @@ class GRBLController(BeamPilotGui):
 
     def serial_reader(self):
         """Event-based serial data reader with buffer management"""
+        last_query = 0.0
         while self.connected:
             if self.ser and self.ser.is_open:
                 try:
-                    # Read all available data
-                    data = self.ser.read(self.ser.in_waiting or 1).decode(errors='ignore')
+                    # Poll position for real-time updates from this thread, the read below never blocks long;
+                    # poll faster while a job moves the head, slower when idle
+                    now = time.monotonic()
+                    interval = RUN_POLL_INTERVAL if self.running and not self.paused else POLL_INTERVAL
+                    if now - last_query >= interval:
+                        self.send_cmd(STATUS_QUERY, log=False)
+                        last_query = now
+
+                    # Read all available data, blocking in the driver until at least one byte arrives
+                    data = self.ser.read(self.ser.in_waiting or 1)
                     if data:
-                        self.receive_buffer += data
+                        buf = self.receive_buffer
+                        buf.extend(data)
                         
-                        # Process complete messages
-                        while '>' in self.receive_buffer or '\n' in self.receive_buffer:
-                            # Try to find a complete status message
-                            start_idx = self.receive_buffer.find('<')
-                            end_idx = self.receive_buffer.find('>')
-                            if start_idx != -1 and end_idx != -1 and start_idx < end_idx:
-                                line = self.receive_buffer[start_idx:end_idx + 1]
-                                self.receive_buffer = self.receive_buffer[end_idx + 1:]
-                                line = line.strip()
+                        # Process complete messages in a single forward scan, resuming where the
+                        # previous read stopped: '<...>' is a status report, anything else ends at '\n'
+                        consumed = 0
+                        i = self.scan_pos
+                        n = len(buf)
+                        while i < n:
+                            c = buf[i]
+                            if c == 0x3C:  # '<'
+                                self.status_start = i
+                            elif c == 0x3E and self.status_start != -1:  # '>'
+                                line = buf[self.status_start:i + 1].decode('ascii', 'ignore')
+                                self.status_start = -1
+                                consumed = i + 1
+                                logger.debug("Received status: %s", line)
+                                self.process_received_line(line)
+                            elif c == 0x0A and self.status_start == -1:  # '\n'
+                                line = buf[consumed:i].decode('ascii', 'ignore').strip()
+                                consumed = i + 1
                                 if line:
-                                    #print(f"Received status: {line}")  # Debug: log received status
-                                    self.process_received_line(line)
-                            else:
-                                # Check for non-status messages (e.g., 'ok', 'error:')
-                                if '\n' in self.receive_buffer:
-                                    line, self.receive_buffer = self.receive_buffer.split('\n', 1)
-                                    line = line.strip()
-                                    if line:
-                                        if line == "ok" or line.startswith("error:"):
-                                            #print(f"Received response: {line}")  # Debug: log ok/error
-                                            self.process_received_line(line)
-                                        else:
-                                            print(f"Ignored incomplete or malformed message: {line}")
-                                break
+                                    if line == "ok" or line.startswith("error:"):
+                                        logger.debug("Received response: %s", line)
+                                        self.process_received_line(line)
+                                    else:
+                                        print(f"Ignored incomplete or malformed message: {line}")
+                            i += 1
+                        if consumed:
+                            del buf[:consumed]
+                            if self.status_start != -1:
+                                self.status_start -= consumed
+                        self.scan_pos = len(buf)
                         
                         # Check for timeout on incomplete data
-                        if self.receive_buffer and time.time() - self.last_data_time > 0.1:  # 100ms timeout
-                            line = self.receive_buffer.strip()
+                        if buf and time.time() - self.last_data_time > 0.1:  # 100ms timeout
+                            line = buf.decode('ascii', 'ignore').strip()
                             if line and not (line.startswith('<') and line.endswith('>')):
                                 print(f"Timeout on incomplete message: {line}")
-                            self.receive_buffer = ""
+                            buf.clear()
+                            self.scan_pos = 0
+                            self.status_start = -1
                         
                     self.last_data_time = time.time()  # Update last data reception time
                 except Exception as e:
                     print(f"Error reading serial port: {e}")
                     time.sleep(0.01)
-            time.sleep(0.001)  # Small delay to prevent CPU overload
+            else:
+                time.sleep(SERIAL_READ_TIMEOUT)
 
     def process_received_line(self, line):
         """Process a complete received line"""
         # Add to response queue for GUI thread processing
         self.response_queue.append(line)
+        if not self.update_scheduled:
+            self.update_scheduled = True
+            self.after_idle(self.update)
         
-        # Handle immediate responses for flow control
+        # Handle immediate responses for flow control, the refill itself runs on the GUI thread
         if line == "ok":
-            #print(f"Processing ok for line {self.current_line}")  # Debug: log ok processing
+            logger.debug("Processing ok for line %d", self.current_line)
+            with self.stream_lock:
+                if self.rx_pending:
+                    self.rx_pending.popleft()
             if self.running and not self.paused:
-                self.send_next_gcode()
+                self.after_idle(self.send_next_gcode)
         elif line.startswith("error:"):
+            # The failed line left the RX buffer as well, top off like after an ok
+            with self.stream_lock:
+                if self.rx_pending:
+                    self.rx_pending.popleft()
+            if self.running and not self.paused:
+                self.after_idle(self.send_next_gcode)
             print(f"GRBL error: {line}")
             messagebox.showerror("Error", f"GRBL error: {line}")
 
-    def poll_position(self):
-        while self.connected:
-            self.send_cmd(STATUS_QUERY, log=False)
-            time.sleep(POLL_INTERVAL)
+    def process_mpos(self, part):
+        pos = part[5:].split(",")
+        try:
+            new_abs = (float(pos[0]), float(pos[1]))
+            self.abs_position = new_abs
+            if time.time() - self.last_g92_time >= POLL_INTERVAL:
+                self.rel_position = (new_abs[0] - self.wcs_offset[0], new_abs[1] - self.wcs_offset[1])
+                self.last_sync_time = time.time()
+            self.position_dirty = True
+        except (ValueError, IndexError):
+            print(f"Error parsing MPos data: {part}")
+
+    def process_wco(self, part):
+        wco = part[4:].split(",")
+        try:
+            self.wcs_offset = (float(wco[0]), float(wco[1]))
+            self.rel_position = (self.abs_position[0] - self.wcs_offset[0], self.abs_position[1] - self.wcs_offset[1])
+            self.last_sync_time = time.time()
+            self.position_dirty = True
+        except (ValueError, IndexError):
+            print(f"Error parsing WCO data: {part}")
 
     def process_responses(self):
-        while self.response_queue:
-            resp = self.response_queue.popleft()
+        queue = self.response_queue
+        popleft = queue.popleft
+        handlers = self.status_handlers
+        while queue:
+            resp = popleft()
             if resp.startswith("<") and resp.endswith(">"):
-                # Process status reports
-                status_content = resp[1:-1]  # Remove '<' and '>'
-                parts = status_content.split("|")
+                # Process status reports, fields are dispatched on their first 4 characters
+                parts = resp[1:-1].split("|")  # Remove '<' and '>'
                 for part in parts[1:]:  # Skip state
-                    if part.startswith("MPos:"):
-                        pos = part[5:].split(",")
-                        try:
-                            new_abs = (float(pos[0]), float(pos[1]))
-                            self.abs_position = new_abs
-                            if time.time() - self.last_g92_time >= POLL_INTERVAL:
-                                self.rel_position = (new_abs[0] - self.wcs_offset[0], new_abs[1] - self.wcs_offset[1])
-                                self.last_sync_time = time.time()
-                            self.update_position_labels()
-                            self.update_position_marker()
-                        except (ValueError, IndexError):
-                            print(f"Error parsing MPos data: {part}")
-                    elif part.startswith("WCO:"):
-                        wco = part[4:].split(",")
-                        try:
-                            self.wcs_offset = (float(wco[0]), float(wco[1]))
-                            self.rel_position = (self.abs_position[0] - self.wcs_offset[0], self.abs_position[1] - self.wcs_offset[1])
-                            self.last_sync_time = time.time()
-                            self.update_position_labels()
-                        except (ValueError, IndexError):
-                            print(f"Error parsing WCO data: {part}")
+                    handler = handlers.get(part[:4])
+                    if handler:
+                        handler(part)
                     # Silently ignore other fields (e.g., FS:, Ov:, A:, state)
             elif resp == "ok":
                 # Already handled in process_received_line for flow control
@@ -358,8 +473,7 @@ class GRBLController(BeamPilotGui):
                 print(f"Other response: {resp}")
 
     def update_relative_position(self, cmd):
-        cmds = cmd.upper().split()
-        dx = dy = 0
+        upper = cmd.upper()
         if cmd == HOME_CMD:
             self.abs_position = (0, 0)
             self.rel_position = (0, 0)
@@ -373,51 +487,41 @@ class GRBLController(BeamPilotGui):
             self.rel_position = (0, 0)
             self.abs_position = self.wcs_offset
         else:
-            for c in cmds:
-                if c.startswith("X"):
-                    try:
-                        dx = float(c[1:])
-                    except ValueError:
-                        print(f"Error parsing X value in command: {c}")
-                        pass
-                elif c.startswith("Y"):
-                    try:
-                        dy = float(c[1:])
-                    except ValueError:
-                        print(f"Error parsing Y value in command: {c}")
-                        pass
-                elif c.startswith("G92"):
-                    if "X" in cmd or "Y" in cmd:
-                        self.wcs_offset = (self.abs_position[0] - dx, self.abs_position[1] - dy)
-                        self.rel_position = (dx, dy)
-                        self.last_g92_time = time.time()
-            if cmd.startswith("G91"):
+            params = self.parse_upper_params(upper)
+            dx = params.get('X', 0)
+            dy = params.get('Y', 0)
+            if upper.startswith("G92"):
+                if 'X' in params or 'Y' in params:
+                    self.wcs_offset = (self.abs_position[0] - dx, self.abs_position[1] - dy)
+                    self.rel_position = (dx, dy)
+                    self.last_g92_time = time.time()
+            elif upper.startswith("G91"):
                 self.rel_position = (self.rel_position[0] + dx, self.rel_position[1] + dy)
                 self.abs_position = (self.abs_position[0] + dx, self.abs_position[1] + dy)
-            elif cmd.startswith("G90"):
+            elif upper.startswith("G90"):
                 self.rel_position = (dx, dy)
                 self.abs_position = (dx + self.wcs_offset[0], dy + self.wcs_offset[1])
         self.update_position_labels()
 
-    def analyze_gcode(self, lines, fix_idle=False):
+    def analyze_gcode(self, lines):
         self.min_x = self.min_y = float("inf")
         self.max_x = self.max_y = float("-inf")
         self.max_working_speed = 0.0
         self.max_idle_speed = 0.0
         self.max_power = 0.0
-        has_g1_idle = False
         in_idle = False
         current_x, current_y = 0.0, 0.0
-        fixed_lines = [] if fix_idle else None
+        idle_indices = []  # Lines using G1 for idle moves, fixed later without another pass
+        # Collect values and reduce them once at the end instead of per line
+        xs, ys = [], []
+        idle_speeds, working_speeds, powers = [], [], []
         
         for i, line in enumerate(lines):
             stripped = line.strip()
             if not stripped or stripped.startswith("%") or stripped.startswith(";"):
-                if fix_idle:
-                    fixed_lines.append(line)
                 continue
             upper = stripped.upper()
-            params = self.parse_params(line)
+            params = self.parse_upper_params(upper)
             new_x = params.get('X', current_x)
             new_y = params.get('Y', current_y)
             
@@ -428,33 +532,35 @@ class GRBLController(BeamPilotGui):
             if 'F' in params:
                 f_val = params['F']
                 if upper.startswith('G0') or (in_idle and upper.startswith('G1')):
-                    self.max_idle_speed = max(self.max_idle_speed, f_val)
+                    idle_speeds.append(f_val)
                 elif upper.startswith('G1'):
-                    self.max_working_speed = max(self.max_working_speed, f_val)
+                    working_speeds.append(f_val)
             if 'S' in params:
-                self.max_power = max(self.max_power, params['S'])
+                powers.append(params['S'])
             if new_x != current_x or new_y != current_y:
-                self.min_x = min(self.min_x, min(current_x, new_x))
-                self.max_x = max(self.max_x, max(current_x, new_x))
-                self.min_y = min(self.min_y, min(current_y, new_y))
-                self.max_y = max(self.max_y, max(current_y, new_y))
-            if in_idle and G1_IDLE_RE.match(upper):
-                has_g1_idle = True
-                if fix_idle:
-                    new_line = re.sub(r'^(G1|G01)\b', 'G0', line, flags=re.IGNORECASE)
-                    fixed_lines.append(new_line)
-                    continue
-            if fix_idle:
-                fixed_lines.append(line)
+                xs.append(current_x)
+                xs.append(new_x)
+                ys.append(current_y)
+                ys.append(new_y)
+            if (in_idle and upper.startswith('G1') and params.get('G') == 1
+                    and 'F' in params and ('X' in params or 'Y' in params)):
+                idle_indices.append(i)
             current_x, current_y = new_x, new_y
+
+        if xs:
+            self.min_x, self.max_x = min(xs), max(xs)
+            self.min_y, self.max_y = min(ys), max(ys)
+        self.max_working_speed = max(working_speeds, default=0.0)
+        self.max_idle_speed = max(idle_speeds, default=0.0)
+        self.max_power = max(powers, default=0.0)
         
-        return has_g1_idle, fixed_lines if fix_idle else lines
+        return bool(idle_indices), idle_indices
 
     def load_file(self):
         file_path = filedialog.askopenfilename(initialdir=self.last_open_dir, filetypes=[("GCode", "*.gcode *.nc")])
         if file_path:
             self.last_open_dir = os.path.dirname(file_path)
-            self.save_config()
+            self.schedule_save()
             
             # Check file size before reading
             try:
@@ -471,32 +577,31 @@ class GRBLController(BeamPilotGui):
                 messagebox.showerror("Error", f"Failed to check file size: {e}")
                 return
             
-            # Read file with line limit check
-            input_lines = []
+            # Map the file and strip comments (parenthetical and semicolon) over the whole buffer
             try:
-                with open(file_path, "r") as f:
-                    for i, line in enumerate(f, 1):
-                        input_lines.append(line.rstrip('\n'))
-                        if i > MAX_GCODE_LINES:
-                            messagebox.showwarning(
-                                "Warning: Too Many Lines",
-                                f"The G-code file has more than {MAX_GCODE_LINES} lines. "
-                                "Loading cancelled to prevent performance issues."
-                            )
-                            return
+                with open(file_path, "rb") as f:
+                    if file_size:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                            data = COMMENT_PAREN_BYTES_RE.sub(b'', buf)
+                        data = COMMENT_SEMI_BYTES_RE.sub(b'', data)
+                    else:
+                        data = b''
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to read G-code file: {e}")
                 return
-            
-            # Remove comments (semicolon and parenthetical) and empty lines
-            cleaned_lines = []
+
+            # Comment stripping keeps line breaks, so this is the raw line count
+            if data.count(b'\n') > MAX_GCODE_LINES:
+                messagebox.showwarning(
+                    "Warning: Too Many Lines",
+                    f"The G-code file has more than {MAX_GCODE_LINES} lines. "
+                    "Loading cancelled to prevent performance issues."
+                )
+                return
+
+            # Drop empty lines
             try:
-                for line in input_lines:
-                    line = re.sub(r'\(.*?\)', '', line)
-                    line = re.split(r';', line)[0]
-                    line = line.strip()
-                    if line:
-                        cleaned_lines.append(line)
+                cleaned_lines = [line.decode() for line in (l.strip() for l in data.splitlines()) if line]
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to process G-code comments: {e}")
                 return
@@ -510,7 +615,7 @@ class GRBLController(BeamPilotGui):
                 )
                 return
             
-            has_g1_idle, lines = self.analyze_gcode(cleaned_lines)
+            has_g1_idle, idle_indices = self.analyze_gcode(cleaned_lines)
             if has_g1_idle:
                 response = messagebox.askyesno(
                     "Warning",
@@ -520,16 +625,10 @@ class GRBLController(BeamPilotGui):
                 )
                 if response:
                     try:
-                        _, fixed_lines = self.analyze_gcode(cleaned_lines, fix_idle=True)
-                        program_dir = os.path.dirname(os.path.abspath(__file__))
-                        i = 1
-                        while os.path.exists(os.path.join(program_dir, f"temp_{i}.gcode")):
-                            i += 1
-                        temp_file = os.path.join(program_dir, f"temp_{i}.gcode")
-                        with open(temp_file, 'w') as f:
-                            for line in fixed_lines:
-                                f.write(line + '\n')
-                        self.temp_files.append(temp_file)
+                        fixed_lines = list(cleaned_lines)
+                        for i in idle_indices:
+                            fixed_lines[i] = 'G0' + fixed_lines[i][2:]
+                        temp_file = self.write_temp_file('\n'.join(fixed_lines) + '\n')
                         initialdir = self.last_save_dir if self.last_save_dir else self.last_open_dir
                         save_path = filedialog.asksaveasfilename(
                             initialdir=initialdir,
@@ -540,35 +639,30 @@ class GRBLController(BeamPilotGui):
                         if save_path:
                             shutil.copy(temp_file, save_path)
                             self.last_save_dir = os.path.dirname(save_path)
-                            self.save_config()
+                            self.schedule_save()
                             file_path = save_path
                         else:
                             file_path = temp_file
-                        with open(file_path, "r") as f:
-                            lines = [line.rstrip('\n') for line in f]
-                        cleaned_lines = []
-                        for line in lines:
-                            line = re.sub(r'\(.*?\)', '', line)
-                            line = re.split(r';', line)[0]
-                            line = line.strip()
-                            if line:
-                                cleaned_lines.append(line)
+                        # Fixed lines are already cleaned, no need to read the file back
+                        cleaned_lines = fixed_lines
                     except Exception as e:
                         print(f"Error processing G1 idle fix: {e}")
                         messagebox.showerror("Error", f"Failed to fix G1 idle moves: {e}")
                         return
             
             self.current_file = file_path
-            self.gcode_lines = cleaned_lines
+            self.set_gcode_lines(cleaned_lines)
             self.current_line = 0
-            self.sent_lines.clear()
             self.gcode_loaded = True
-            try:
-                self.draw_gcode()
-                self.update_file_info()
-            except Exception as e:
-                print(f"Error updating G-code display: {e}")
-                messagebox.showerror("Error", f"Failed to update G-code display: {e}")
+            self.draw_in_background()
+
+    def write_temp_file(self, text):
+        """Write G-code text to a new temp file with a single write; the file is removed on quit"""
+        fd, temp_file = tempfile.mkstemp(suffix=".gcode", prefix=TEMP_FILE_PREFIX)
+        self.temp_files.append(temp_file)
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        return temp_file
 
     def save_file(self):
         if not self.gcode_loaded or not self.current_file:
@@ -580,27 +674,118 @@ class GRBLController(BeamPilotGui):
                 shutil.copy(self.current_file, file_path)
                 self.last_save_dir = os.path.dirname(file_path)
                 self.file_name_label.config(text=f"File Name: {os.path.basename(file_path)}")
-                self.save_config()
+                self.schedule_save()
             except Exception as e:
                 print(f"Error saving G-code file: {e}")
                 messagebox.showerror("Error", f"Failed to save G-code file: {e}")
 
-    def send_cmd(self, cmd, log=True):
+    def set_gcode_lines(self, lines):
+        """Set the loaded program and pre-encode its lines for streaming"""
+        self.gcode_lines = lines
+        self.line_bytes = [(line + "\n").encode() for line in lines]
+        self.line_lens = array.array('I', map(len, self.line_bytes))
+        self.parsed_lines = None
+        # The drawing still shows the previous program until the new one is drawn
+        self.line_to_path = array.array('i')
+        self.line_segment = bytearray()
+        self.path_segments = bytearray()
+        self.sent_segments = bytearray()
+        self.pending_split = {}
+
+    def draw_in_background(self):
+        """Parse the program on a worker thread so the GUI stays responsive, then draw it"""
+        lines = self.gcode_lines
+        threading.Thread(target=self.parse_worker, args=(lines,), daemon=True).start()
+
+    def parse_worker(self, lines):
+        parsed = [self.parse_draw_fields(line) for line in lines]
+        self.after_idle(self.finish_draw, lines, parsed)
+
+    def finish_draw(self, lines, parsed):
+        if lines is not self.gcode_lines:
+            return  # Another program was loaded while parsing
+        self.parsed_lines = parsed
+        try:
+            self.draw_gcode()
+            self.update_file_info()
+        except Exception as e:
+            print(f"Error updating G-code display: {e}")
+            messagebox.showerror("Error", f"Failed to update G-code display: {e}")
+
+    def send_cmd(self, cmd, log=True, data=None):
         if self.connected and self.ser and self.ser.is_open:
             try:
-                self.ser.write((cmd + "\n").encode())
+                if data is None:
+                    data = COMMAND_BYTES.get(cmd) or (cmd + "\n").encode()
+                # The reader thread sends status queries while the GUI streams, so the count
+                # and the write happen together
+                with self.stream_lock:
+                    if self.running and cmd not in REALTIME_CMDS:
+                        # Every line is answered with ok/error, account for the bytes it
+                        # occupies in the GRBL RX buffer until then
+                        self.rx_pending.append(len(data))
+                    self.ser.write(data)
                 if log and cmd != STATUS_QUERY:
                     self.sent_commands.append(cmd)
-                    self.cmd_monitor.insert(tk.END, cmd + "\n")
-                    self.cmd_monitor.see(tk.END)
-                    #print(f"Sent command: {cmd}")  # Debug: log sent command
-                    if cmd.startswith(("G0 ", "G1 ", "G91", "G90", "G92", "$H", RETURN_ZERO_CMD)):
+                    self.cmd_monitor_pending.append(cmd + "\n")
+                    if not self.cmd_monitor_scheduled:
+                        self.cmd_monitor_scheduled = True
+                        self.after(CMD_MONITOR_FLUSH_INTERVAL, self.flush_cmd_monitor)
+                    logger.debug("Sent command: %s", cmd)
+                    if cmd[:2] in POSITION_CMD_PREFIXES:
                         self.update_relative_position(cmd)
                         if cmd.startswith("G92"):
                             self.last_g92_time = time.time()
             except Exception as e:
                 print(f"Error sending command: {e}")
 
+    def flush_cmd_monitor(self):
+        # Insert all commands sent since the last flush with a single widget update
+        pending = self.cmd_monitor_pending
+        self.cmd_monitor_pending = []
+        self.cmd_monitor_scheduled = False
+        if pending:
+            self.cmd_monitor.insert(tk.END, "".join(pending))
+            # Keep the widget bounded, trimming in chunks so it is not done on every flush
+            line_count = int(self.cmd_monitor.index("end-1c").split(".")[0])
+            if line_count > CMD_MONITOR_MAX_LINES:
+                keep = CMD_MONITOR_MAX_LINES * 3 // 4
+                self.cmd_monitor.delete("1.0", f"{line_count - keep}.0")
+            self.cmd_monitor.see(tk.END)
+
+    def flush_recolor(self):
+        # Recolor all paths queued since the last flush with one Tcl call per color
+        pending = self.pending_recolor
+        self.pending_recolor = {}
+        self.recolor_scheduled = False
+        try:
+            self.split_sent_paths(pending.setdefault(SENT_PATH_COLOR, []))
+            for color, items in pending.items():
+                self.tk.call('foreach', 'item', tuple(items), f'{self.canvas} itemconfigure $item -fill {color}')
+        except Exception as e:
+            print(f"Error updating canvas paths: {e}")
+
+    def split_sent_paths(self, sent_items):
+        """Cut the sent part off partly sent paths so progress follows the machine line by line"""
+        # Runs on the GUI thread like send_next_gcode, the spans are final once recorded
+        pending = self.pending_split
+        self.pending_split = {}
+        for idx, (first, last) in pending.items():
+            path_id = self.paths[idx]
+            if last == self.path_segments[idx]:
+                # Rest of the path sent, recolor what is left of it in place
+                sent_items.append(path_id)
+                continue
+            # The item holds the points of segments first..end, earlier ones were split off already
+            coords = self.canvas.coords(path_id)
+            cut = 2 * (last - first)
+            sent_id = self.canvas.create_line(
+                *coords[:cut + 2],
+                fill=SENT_PATH_COLOR, dash=self.canvas.itemcget(path_id, "dash"), tags="gcode_path"
+            )
+            self.canvas.tag_lower(sent_id, path_id)
+            self.canvas.coords(path_id, *coords[cut:])
+
     def jog(self, cmd_template):
         if not self.connected:
             return
@@ -660,124 +845,123 @@ class GRBLController(BeamPilotGui):
         self.running = True
         self.paused = False
         self.current_line = 0
-        self.sent_lines.clear()
+        with self.stream_lock:
+            self.rx_pending.clear()
         self.pause_btn.config(text="Pause", state=tk.NORMAL)
-        print("Starting G-code execution")  # Debug: log start
+        logger.debug("Starting G-code execution")
         self.send_next_gcode()
 
     def pause_gcode(self):
         if self.running:
             self.paused = True
             self.send_cmd(PAUSE_CMD)
-            print("G-code paused")  # Debug: log pause
+            logger.debug("G-code paused")
 
     def resume_gcode(self):
         self.paused = False
         self.send_cmd(RESUME_CMD)
-        print("Resuming G-code execution")  # Debug: log resume
+        logger.debug("Resuming G-code execution")
         self.send_next_gcode()
 
     def stop_gcode(self):
         self.running = False
         self.paused = False
         self.current_line = 0
+        with self.stream_lock:
+            self.rx_pending.clear()
         self.pause_btn.config(text="Pause", state=tk.DISABLED)
         self.send_cmd(SOFT_RESET)
-        print("G-code stopped")  # Debug: log stop
+        logger.debug("G-code stopped")
 
     def send_next_gcode(self):
-        if not self.running or self.paused or self.current_line >= len(self.gcode_lines):
-            if self.current_line >= len(self.gcode_lines):
-                self.running = False
-                self.pause_btn.config(state=tk.DISABLED)
-                print("G-code execution completed")  # Debug: log completion
+        """Top off the GRBL RX buffer with as many lines as fit (character-counting protocol)"""
+        if not self.running or self.paused:
             return
-            
-        line = self.gcode_lines[self.current_line]
-        #print(f"Sending G-code line {self.current_line}: {line}")  # Debug: log line being sent
-        self.send_cmd(line)
-        self.sent_lines.add(self.current_line)
-        
-        if self.current_line in self.line_to_path:
-            idx = self.line_to_path[self.current_line]
-            if 0 <= idx < len(self.paths):
-                try:
-                    self.canvas.itemconfig(self.paths[idx], fill="red")
-                except Exception:
-                    print(f"Error updating canvas path for line {self.current_line}")
-                    pass
-        self.current_line += 1
+        lines = self.gcode_lines
+        line_bytes = self.line_bytes
+        line_lens = self.line_lens
+        line_to_path = self.line_to_path
+        line_segment = self.line_segment
+        sent_segments = self.sent_segments
+        pending_split = self.pending_split
+        total = len(lines)
+        while self.current_line < total:
+            i = self.current_line
+            # The reader thread pops acknowledged lines concurrently
+            with self.stream_lock:
+                if self.rx_pending and sum(self.rx_pending) + line_lens[i] > GRBL_RX_BUFFER_SIZE:
+                    break
+            logger.debug("Sending G-code line %d: %s", i, lines[i])
+            self.send_cmd(lines[i], data=line_bytes[i])
+
+            idx = line_to_path[i] if i < len(line_to_path) else -1
+            if 0 <= idx < len(sent_segments) and line_segment[i] >= sent_segments[idx]:
+                # Remember which segments were sent since the last flush, flush_recolor splits the path there
+                first = pending_split[idx][0] if idx in pending_split else sent_segments[idx]
+                sent_segments[idx] = line_segment[i] + 1
+                pending_split[idx] = (first, sent_segments[idx])
+            self.current_line += 1
+
+        if (self.pending_recolor or pending_split) and not self.recolor_scheduled:
+            self.recolor_scheduled = True
+            self.after(RECOLOR_FLUSH_INTERVAL, self.flush_recolor)
+
+        if self.current_line >= total and not self.rx_pending:
+            self.running = False
+            self.pause_btn.config(state=tk.DISABLED)
+            logger.debug("G-code execution completed")
 
     def send_custom_cmd(self):
         cmd = self.cmd_entry.get()
         if cmd:
             self.last_command.set(cmd)
-            self.save_config()
+            self.schedule_save()
             self.send_cmd(cmd)
             self.cmd_entry.delete(0, tk.END)
 
-    def process_with_script(self, script_name, *args):
+    def process_with_script(self, script, *args):
         if not self.gcode_loaded or not self.current_file:
             return
-        program_dir = os.path.dirname(os.path.abspath(__file__))
-        script = os.path.join(program_dir, script_name)
-        i = 1
-        while os.path.exists(os.path.join(program_dir, f"temp_{i}.gcode")):
-            i += 1
-        temp_file = os.path.join(program_dir, f"temp_{i}.gcode")
         try:
-            with open(temp_file, 'w') as f:
-                for line in self.gcode_lines:
-                    f.write(line + '\n')
-            self.temp_files.append(temp_file)
-            cmd = f"{sys.executable} {script} {temp_file} {' '.join(map(str, args))} {temp_file}"
-            os.system(cmd)
-            with open(temp_file, 'r') as f:
-                lines = [line.rstrip('\n') for line in f]
+            lines = script.process([line + '\n' for line in self.gcode_lines], *args)
+            # Keep the result in a file for Save and the file name label
+            temp_file = self.write_temp_file(''.join(lines))
             cleaned_lines = []
             for line in lines:
-                line = re.sub(r'\(.*?\)', '', line)
-                line = re.split(r';', line)[0]
-                line = line.strip()
+                line = strip_comments(line)
                 if line:
                     cleaned_lines.append(line)
-            self.gcode_lines = cleaned_lines
+            self.set_gcode_lines(cleaned_lines)
             self.current_file = temp_file
             self.gcode_loaded = True
-            self.draw_gcode()
-            self.update_file_info()
-            self.save_config()  # Save config after processing
+            self.draw_in_background()
         except Exception as e:
-            print(f"Error processing G-code with script {script_name}: {e}")
+            print(f"Error processing G-code with script {script.__name__}: {e}")
             messagebox.showerror("Error", f"Failed to process G-code: {e}")
 
-    def run_fix(self):
-        power = self.power_fix_var.get()
+    def read_positive(self, variables, convert, message):
+        """Return the entry values if all convert to positive numbers, otherwise show message and return None"""
+        values = [var.get() for var in variables]
         try:
-            power_val = float(power)
-            if power_val <= 0:
-                raise ValueError
+            if all(convert(value) > 0 for value in values):
+                return values
         except ValueError:
-            print("Error: Power must be a positive number")
-            messagebox.showerror("Error", "Power must be a positive number")
-            return
-        self.process_with_script(FIX_POWER_SCRIPT, power)
-        self.save_config()
+            pass
+        print(f"Error: {message}")
+        messagebox.showerror("Error", message)
+        return None
+
+    def run_fix(self):
+        values = self.read_positive((self.power_fix_var,), float, "Power must be a positive number")
+        if values:
+            self.process_with_script(fix_power, *values)
+            self.schedule_save()
 
     def run_scale(self):
-        max_x = self.max_x_var.get()
-        max_y = self.max_y_var.get()
-        try:
-            x_val = float(max_x)
-            y_val = float(max_y)
-            if x_val <= 0 or y_val <= 0:
-                raise ValueError
-        except ValueError:
-            print("Error: Target sizes must be positive numbers")
-            messagebox.showerror("Error", "Target sizes must be positive numbers")
-            return
-        self.process_with_script(SCALE_GCODE_SCRIPT, max_x, max_y)
-        self.save_config()
+        values = self.read_positive((self.max_x_var, self.max_y_var), float, "Target sizes must be positive numbers")
+        if values:
+            self.process_with_script(scale_gcode, *values)
+            self.schedule_save()
 
     def run_optimize(self):
         opt_level = self.opt_level_var.get()
@@ -789,56 +973,51 @@ class GRBLController(BeamPilotGui):
             print("Error: Optimization level must be 0, 1, or 2")
             messagebox.showerror("Error", "Optimization level must be 0, 1, or 2")
             return
-        self.process_with_script(OPTIMIZE_GCODE_SCRIPT, "--level", opt_level)
-        self.save_config()
+        self.process_with_script(optimize_gcode, opt_level)
+        self.schedule_save()
 
     def run_adjust_speed(self):
-        max_speed = self.max_speed_var.get()
-        max_idle_speed = self.max_idle_speed_var.get()
-        try:
-            speed_val = float(max_speed)
-            idle_speed_val = float(max_idle_speed)
-            if speed_val <= 0 or idle_speed_val <= 0:
-                raise ValueError
-        except ValueError:
-            print("Error: Max working and idle speeds must be positive numbers")
-            messagebox.showerror("Error", "Max working and idle speeds must be positive numbers")
-            return
-        self.process_with_script(ADJUST_SPEED_SCRIPT, max_speed, max_idle_speed)
-        self.save_config()
+        values = self.read_positive((self.max_speed_var, self.max_idle_speed_var), float,
+                                    "Max working and idle speeds must be positive numbers")
+        if values:
+            self.process_with_script(adj_speed, *values)
+            self.schedule_save()
 
     def run_adjust_power(self):
-        max_power = self.max_power_var.get()
-        try:
-            power_val = int(max_power)
-            if power_val <= 0:
-                raise ValueError
-        except ValueError:
-            print("Error: Max power must be a positive integer")
-            messagebox.showerror("Error", "Max power must be a positive integer")
-            return
-        self.process_with_script(ADJUST_POWER_SCRIPT, max_power)
-        self.save_config()
+        values = self.read_positive((self.max_power_var,), int, "Max power must be a positive integer")
+        if values:
+            self.process_with_script(adj_power, *values)
+            self.schedule_save()
 
     def update(self):
+        """Handle queued responses on the Tk thread, scheduled by the serial reader"""
+        self.update_scheduled = False
         self.process_responses()
-        if self.connected and time.time() - self.last_sync_time >= POLL_INTERVAL:
-            self.send_cmd(STATUS_QUERY, log=False)
-        self.after(100, self.update)
+        # Redraw position once, however many status reports arrived
+        if self.position_dirty:
+            self.position_dirty = False
+            self.update_position_labels()
+            self.update_position_marker()
+
+    def remove_temp_files(self, temp_files):
+        for temp_file in temp_files:
+            try:
+                os.remove(temp_file)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error removing temporary file {temp_file}: {e}")
 
     def quit_app(self):
-        for temp_file in self.temp_files:
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except Exception as e:
-                    print(f"Error removing temporary file {temp_file}: {e}")
+        # Non-daemon thread: the window closes at once and Python waits for the cleanup on exit
+        threading.Thread(target=self.remove_temp_files, args=(list(self.temp_files),)).start()
+        self.temp_files = []
         self.save_config()
         self.quit()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
     app = GRBLController()
     app.last_data_time = time.time()  # Initialize last data time
-    app.after(100, app.update)
     app.mainloop()
 
@@ -1,12 +1,26 @@
 import os
+import time
+import array
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
 DEFAULT_STEP_OPTIONS = ["1", "2", "3", "4", "5", "6", "7", "8", "9"]
 DEFAULT_MULTIPLIER_OPTIONS = ["0.1", "1", "10", "100"]
 RIGHT_PANEL_WIDTH = 250
+PATH_GROUP_SEGMENTS = 32  # Max consecutive segments drawn as one polyline (at most 255, offsets are kept in bytearrays)
 
 class BeamPilotGui(tk.Tk):
+    icon_cache = {}  # Image file name -> PhotoImage (None if it failed to load), shared by all widgets
+
+    def load_icon(self, img_name):
+        """Return the PhotoImage for an image in the images directory, decoding each file only once"""
+        if img_name not in self.icon_cache:
+            try:
+                self.icon_cache[img_name] = tk.PhotoImage(file=os.path.join("images", img_name))
+            except tk.TclError:
+                self.icon_cache[img_name] = None
+        return self.icon_cache[img_name]
+
     def setup_gui(self):
         # Menu
         menubar = tk.Menu(self)
@@ -25,7 +39,8 @@ class BeamPilotGui(tk.Tk):
         # Left panel: Graphics
         self.left_frame = tk.Frame(self)
         self.paned.add(self.left_frame, weight=1)
-        self.canvas = tk.Canvas(self.left_frame, bg="white")
+        # Not confined to a scroll region so the view can be panned freely
+        self.canvas = tk.Canvas(self.left_frame, bg="white", confine=False)
         self.canvas.pack(fill=tk.BOTH, expand=True)
         self.canvas.bind("<MouseWheel>", self.zoom)
         self.canvas.bind("<Button-4>", lambda e: self.zoom(e, delta=1))
@@ -35,6 +50,8 @@ class BeamPilotGui(tk.Tk):
         self.size_label = tk.Label(self.left_frame, text="X: 0-0 Y: 0-0")
         self.size_label.pack(side=tk.BOTTOM)
         self.position_marker = self.canvas.create_oval(0, 0, 0, 0, fill="red")
+        self.marker_xy = None  # Last marker center set with coords, None when it must be set again
+        self.position_texts = (None, None)  # Last texts of the Abs/Rel position labels
 
         # Right panel: Controls with Notebook
         self.right_frame = tk.Frame(self, width=RIGHT_PANEL_WIDTH)
@@ -42,16 +59,24 @@ class BeamPilotGui(tk.Tk):
         self.paned.add(self.right_frame, weight=0)
 
         # Bind to <Configure> for dynamic sizing
-        def update_sash(event=None):
+        def apply_sash():
+            self.sash_pending = False
             if self.winfo_width() > 1:  # Avoid setting if window not yet realized (width=1)
                 self.paned.sashpos(0, self.winfo_width() - RIGHT_PANEL_WIDTH)
             else:
                 # Fallback: Retry after a short delay if window not yet sized
-                self.after(50, update_sash)
+                self.after(50, apply_sash)
 
+        def update_sash(event=None):
+            # A resize fires many <Configure> events, move the sash once when they settle
+            if not self.sash_pending:
+                self.sash_pending = True
+                self.after_idle(apply_sash)
+
+        self.sash_pending = False
         self.bind("<Configure>", update_sash)
         self.update_idletasks()  # Force layout update
-        update_sash()  # Call once immediately (in case already sized)
+        apply_sash()  # Call once immediately (in case already sized)
 
         # Create notebook (tabs)
         self.notebook = ttk.Notebook(self.right_frame)
@@ -149,11 +174,7 @@ class BeamPilotGui(tk.Tk):
         
         for i, (img_name, cmd) in enumerate(directions):
             row, col = divmod(i, 3)
-            img_path = os.path.join("images", img_name)
-            try:
-                photo = tk.PhotoImage(file=img_path)
-            except Exception:
-                photo = None
+            photo = self.load_icon(img_name)
             if photo:
                 btn = ttk.Button(button_frame, image=photo, width=36, command=lambda c=cmd: self.jog(c))
                 btn.image = photo
@@ -191,15 +212,9 @@ class BeamPilotGui(tk.Tk):
         buttons_subframe = ttk.Frame(run_frame)
         buttons_subframe.pack(anchor=tk.CENTER)
 
-        run_img = None
-        pause_img = None
-        stop_img = None
-        try:
-            run_img = tk.PhotoImage(file="images/run.png")
-            pause_img = tk.PhotoImage(file="images/pause.png")
-            stop_img = tk.PhotoImage(file="images/stop.png")
-        except tk.TclError:
-            pass
+        run_img = self.load_icon("run.png")
+        pause_img = self.load_icon("pause.png")
+        stop_img = self.load_icon("stop.png")
 
         start_btn = ttk.Button(buttons_subframe, image=run_img, text="Start", compound='top',
                               command=self.start_gcode)
@@ -246,6 +261,9 @@ class BeamPilotGui(tk.Tk):
         self.warning_label.pack_forget()
 
     def setup_process_tab(self):
+        # Reject non-numeric keystrokes so the handlers only see numbers or empty fields
+        float_vcmd = (self.register(self.is_float_input), '%P')
+        int_vcmd = (self.register(self.is_int_input), '%P')
         self.process_notebook = ttk.Notebook(self.process_tab)
         self.process_notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
@@ -255,7 +273,7 @@ class BeamPilotGui(tk.Tk):
 
         power_label = ttk.Label(self.fix_tab, text="Power:", font=("Arial", 9, "bold"))
         power_label.pack(fill=tk.X, pady=(5, 2))
-        power_entry = ttk.Entry(self.fix_tab, textvariable=self.power_fix_var)
+        power_entry = ttk.Entry(self.fix_tab, textvariable=self.power_fix_var, validate='key', validatecommand=float_vcmd)
         power_entry.pack(fill=tk.X, padx=5, pady=(0, 5))
         fix_btn = ttk.Button(self.fix_tab, text="Fix", command=self.run_fix)
         fix_btn.pack(fill=tk.X, padx=5, pady=5)
@@ -269,10 +287,10 @@ class BeamPilotGui(tk.Tk):
         size_frame = ttk.Frame(self.scale_tab)
         size_frame.pack(fill=tk.X, pady=5)
         ttk.Label(size_frame, text="X:").pack(side=tk.LEFT, padx=2)
-        x_entry = ttk.Entry(size_frame, textvariable=self.max_x_var, width=10)
+        x_entry = ttk.Entry(size_frame, textvariable=self.max_x_var, width=10, validate='key', validatecommand=float_vcmd)
         x_entry.pack(side=tk.LEFT, padx=5)
         ttk.Label(size_frame, text="Y:").pack(side=tk.LEFT, padx=2)
-        y_entry = ttk.Entry(size_frame, textvariable=self.max_y_var, width=10)
+        y_entry = ttk.Entry(size_frame, textvariable=self.max_y_var, width=10, validate='key', validatecommand=float_vcmd)
         y_entry.pack(side=tk.LEFT, padx=5)
         scale_btn = ttk.Button(self.scale_tab, text="Scale", command=self.run_scale)
         scale_btn.pack(fill=tk.X, padx=5, pady=5)
@@ -297,29 +315,37 @@ class BeamPilotGui(tk.Tk):
 
         speed_label = ttk.Label(self.power_speed_tab, text="Max Working Speed (mm/min):", font=("Arial", 9, "bold"))
         speed_label.pack(fill=tk.X, pady=(5, 2))
-        speed_entry = ttk.Entry(self.power_speed_tab, textvariable=self.max_speed_var)
+        speed_entry = ttk.Entry(self.power_speed_tab, textvariable=self.max_speed_var, validate='key', validatecommand=float_vcmd)
         speed_entry.pack(fill=tk.X, padx=5, pady=(0, 5))
         idle_speed_label = ttk.Label(self.power_speed_tab, text="Max Idle Speed (mm/min):", font=("Arial", 9, "bold"))
         idle_speed_label.pack(fill=tk.X, pady=(5, 2))
-        idle_speed_entry = ttk.Entry(self.power_speed_tab, textvariable=self.max_idle_speed_var)
+        idle_speed_entry = ttk.Entry(self.power_speed_tab, textvariable=self.max_idle_speed_var, validate='key', validatecommand=float_vcmd)
         idle_speed_entry.pack(fill=tk.X, padx=5, pady=(0, 5))
         speed_btn = ttk.Button(self.power_speed_tab, text="Adjust Speed", command=self.run_adjust_speed)
         speed_btn.pack(fill=tk.X, padx=5, pady=5)
 
         power_label = ttk.Label(self.power_speed_tab, text="Max Power:", font=("Arial", 9, "bold"))
         power_label.pack(fill=tk.X, pady=(5, 2))
-        power_entry = ttk.Entry(self.power_speed_tab, textvariable=self.max_power_var)
+        power_entry = ttk.Entry(self.power_speed_tab, textvariable=self.max_power_var, validate='key', validatecommand=int_vcmd)
         power_entry.pack(fill=tk.X, padx=5, pady=(0, 5))
         power_btn = ttk.Button(self.power_speed_tab, text="Adjust Power", command=self.run_adjust_power)
         power_btn.pack(fill=tk.X, padx=5, pady=5)
 
+    def is_float_input(self, text):
+        return text == "" or text.replace(".", "", 1).isdecimal() or text == "."
+
+    def is_int_input(self, text):
+        return text == "" or text.isdecimal()
+
     def draw_gcode(self):
         if not self.gcode_loaded:
             return
             
         self.canvas.delete("all")
-        self.paths = []
-        self.line_to_path = {}
+        self.paths = array.array('I')
+        self.line_to_path = array.array('i', [-1]) * len(self.gcode_lines)
+        self.line_segment = bytearray(len(self.gcode_lines))
+        self.path_segments = bytearray()
         current_x, current_y = 0.0, 0.0
         laser_on = False
         
@@ -330,57 +356,103 @@ class BeamPilotGui(tk.Tk):
         self.max_idle_speed = 0.0
         self.max_power = 0.0
         
-        for i, line in enumerate(self.gcode_lines):
-            params = self.parse_params(line)
-            new_x = params.get('X', current_x)
-            new_y = params.get('Y', current_y)
-            is_cut = False
+        # Parse once per loaded program into fixed tuples, redraws reuse them
+        if self.parsed_lines is None:
+            self.parsed_lines = [self.parse_draw_fields(line) for line in self.gcode_lines]
+        parsed_lines = self.parsed_lines
+
+        # Consecutive connected segments of the same style are drawn as one polyline item
+        group_coords = []
+        group_lines = []
+        group_style = None
+        # Segment endpoints, reduced to bounds after the loop
+        xs = []
+        ys = []
+        last_point = None
+        last_canvas = None
+        # Model -> canvas transform (see model_to_canvas), bound locally for the loop
+        ax, bx = self.affine_ax, self.affine_bx
+        ay, by = self.affine_ay, self.affine_by
+
+        def flush_group():
+            color, dash = group_style
+            path_id = self.canvas.create_line(
+                *group_coords,
+                fill=color, dash=dash, tags="gcode_path"
+            )
+            path_index = len(self.paths)
+            for segment, line_index in enumerate(group_lines):
+                self.line_to_path[line_index] = path_index
+                self.line_segment[line_index] = segment
+            self.paths.append(path_id)
+            self.path_segments.append(len(group_lines))
+
+        for i, (head, g_val, m_val, x_val, y_val, f_val, s_val) in enumerate(parsed_lines):
+            new_x = current_x if x_val is None else x_val
+            new_y = current_y if y_val is None else y_val
             in_idle = False
             
-            if 'G' in params:
-                g_val = params['G']
+            if g_val is not None:
                 if g_val == 0:
                     laser_on = False
                 elif g_val == 1:
                     laser_on = True
                 elif g_val == 92:
-                    dx = params.get('X', 0)
-                    dy = params.get('Y', 0)
+                    dx = 0 if x_val is None else x_val
+                    dy = 0 if y_val is None else y_val
                     self.wcs_offset = (current_x - dx, current_y - dy)
                     self.last_g92_time = time.time()
                     current_x, current_y = dx, dy
-            if 'M' in params:
-                m_val = params['M']
+            if m_val is not None:
                 if m_val in (3, 4):
                     laser_on = True
                     in_idle = False
                 elif m_val == 5:
                     laser_on = False
                     in_idle = True
-            if 'F' in params:
-                f_val = params['F']
-                if line.upper().startswith('G0') or (in_idle and line.upper().startswith('G1')):
+            if f_val is not None:
+                if head == 'G0' or (in_idle and head == 'G1'):
                     self.max_idle_speed = max(self.max_idle_speed, f_val)
-                elif line.upper().startswith('G1'):
+                elif head == 'G1':
                     self.max_working_speed = max(self.max_working_speed, f_val)
-            if 'S' in params:
-                self.max_power = max(self.max_power, params['S'])
+            if s_val is not None:
+                self.max_power = max(self.max_power, s_val)
             if new_x != current_x or new_y != current_y:
-                self.min_x = min(self.min_x, min(current_x, new_x))
-                self.max_x = max(self.max_x, max(current_x, new_x))
-                self.min_y = min(self.min_y, min(current_y, new_y))
-                self.max_y = max(self.max_y, max(current_y, new_y))
-                color = "blue" if (laser_on or params.get('S', 0) > 0) else "blue"
-                dash = () if (laser_on or params.get('S', 0) > 0) else (2, 2)
-                x1, y1 = self.model_to_canvas(current_x, current_y)
-                x2, y2 = self.model_to_canvas(new_x, new_y)
-                path_id = self.canvas.create_line(
-                    x1, y1, x2, y2,
-                    fill=color, dash=dash, tags=("gcode_path", f"path_{i}")
-                )
-                self.line_to_path[i] = len(self.paths)
-                self.paths.append(path_id)
+                burning = laser_on or (s_val is not None and s_val > 0)
+                color = "blue" if burning else "blue"
+                dash = () if burning else (2, 2)
+                # A segment usually starts where the previous one ended: reuse that canvas point,
+                # the start is then already collected for the bounds
+                if (current_x, current_y) == last_point:
+                    x1, y1 = last_canvas
+                else:
+                    x1, y1 = ax * current_x + bx, ay * current_y + by
+                    xs.append(current_x)
+                    ys.append(current_y)
+                xs.append(new_x)
+                ys.append(new_y)
+                x2, y2 = ax * new_x + bx, ay * new_y + by
+                last_point = (new_x, new_y)
+                last_canvas = (x2, y2)
+                style = (color, dash)
+                if (group_lines and (style != group_style or len(group_lines) >= PATH_GROUP_SEGMENTS
+                                     or group_coords[-2] != x1 or group_coords[-1] != y1)):
+                    flush_group()
+                    group_coords = []
+                    group_lines = []
+                if not group_lines:
+                    group_coords += (x1, y1)
+                    group_style = style
+                group_coords += (x2, y2)
+                group_lines.append(i)
             current_x, current_y = new_x, new_y
+        if group_lines:
+            flush_group()
+        if xs:
+            self.min_x, self.max_x = min(xs), max(xs)
+            self.min_y, self.max_y = min(ys), max(ys)
+        self.sent_segments = bytearray(len(self.paths))
+        self.pending_split = {}
 
         x1 = 0 * self.scale_factor + self.offset_x
         y_axis = 500 * self.scale_factor + self.offset_y
@@ -390,26 +462,37 @@ class BeamPilotGui(tk.Tk):
         y1 = 0 * self.scale_factor + self.offset_y
         y2 = 600 * self.scale_factor + self.offset_y
         self.canvas.create_line(x_axis, y1, x_axis, y2, arrow=tk.BOTH, tags="axis")
+        # delete("all") removed the marker, recreate it on top; update_position_marker only moves it
+        self.position_marker = self.canvas.create_oval(0, 0, 0, 0, fill="red", tags="position")
+        self.marker_xy = None
 
         self.size_label.config(text=f"X: {self.min_x:.2f}-{self.max_x:.2f} Y: {self.min_y:.2f}-{self.max_y:.2f}" if self.min_x != float("inf") else "X: 0-0 Y: 0-0")
         self.update_position_marker()
 
     def update_position_labels(self):
-        self.pos_abs_label.config(text=f"Abs: X={self.abs_position[0]:.3f} Y={self.abs_position[1]:.3f}")
-        self.pos_rel_label.config(text=f"Rel: X={self.rel_position[0]:.3f} Y={self.rel_position[1]:.3f}")
+        # Only reconfigure labels whose text changed
+        abs_text = f"Abs: X={self.abs_position[0]:.3f} Y={self.abs_position[1]:.3f}"
+        rel_text = f"Rel: X={self.rel_position[0]:.3f} Y={self.rel_position[1]:.3f}"
+        last_abs, last_rel = self.position_texts
+        if abs_text != last_abs:
+            self.pos_abs_label.config(text=abs_text)
+        if rel_text != last_rel:
+            self.pos_rel_label.config(text=rel_text)
+        self.position_texts = (abs_text, rel_text)
 
     def update_position_marker(self):
         try:
             pos = self.rel_position if self.display_coords.get() == "relative" else self.abs_position
             cx, cy = self.model_to_canvas(pos[0], pos[1])
-            if not self.canvas.find_withtag(self.position_marker):
-                self.position_marker = self.canvas.create_oval(cx-5, cy-5, cx+5, cy+5, fill="red", tags="position")
-            else:
-                self.canvas.coords(self.position_marker, cx-5, cy-5, cx+5, cy+5)
-        except Exception:
-            print("Error updating position marker")
-            cx, cy = self.model_to_canvas(self.abs_position[0], self.abs_position[1])
-            self.position_marker = self.canvas.create_oval(cx-5, cy-5, cx+5, cy+5, fill="red", tags="position")
+            # Recomputed at the current scale on every update, so whole pixels are precise enough
+            cx = round(cx)
+            cy = round(cy)
+            if (cx, cy) == self.marker_xy:
+                return
+            self.canvas.coords(self.position_marker, cx-5, cy-5, cx+5, cy+5)
+            self.marker_xy = (cx, cy)
+        except Exception as e:
+            print(f"Error updating position marker: {e}")
 
     def update_file_info(self):
         if not self.gcode_loaded:
@@ -444,34 +527,29 @@ class BeamPilotGui(tk.Tk):
         self.scale_factor *= factor
         
         try:
-            cursor_x = event.x
-            cursor_y = event.y
+            window_x = event.x
+            window_y = event.y
         except Exception:
-            cursor_x = int(self.canvas.winfo_width() / 2)
-            cursor_y = int(self.canvas.winfo_height() / 2)
+            window_x = int(self.canvas.winfo_width() / 2)
+            window_y = int(self.canvas.winfo_height() / 2)
+        # The view may be panned, scale around the cursor in canvas coordinates
+        cursor_x = self.canvas.canvasx(window_x)
+        cursor_y = self.canvas.canvasy(window_y)
             
         scale_ratio = factor
         self.offset_x = cursor_x - (cursor_x - self.offset_x) * scale_ratio
         self.offset_y = cursor_y - (cursor_y - self.offset_y) * scale_ratio
+        self.update_affine()
         
         self.canvas.scale("all", cursor_x, cursor_y, scale_ratio, scale_ratio)
+        self.marker_xy = None  # scale() moved the marker as well
         self.update_position_marker()
 
     def start_drag(self, event):
-        self.drag_start_x = event.x
-        self.drag_start_y = event.y
+        self.canvas.scan_mark(event.x, event.y)
 
     def drag(self, event):
         if not self.gcode_loaded:
             return
-            
-        dx = event.x - self.drag_start_x
-        dy = event.y - self.drag_start_y
-        
-        self.canvas.move("all", dx, dy)
-        self.offset_x += dx
-        self.offset_y += dy
-        
-        self.drag_start_x = event.x
-        self.drag_start_y = event.y
-        self.update_position_marker()
+        # Pan the view instead of moving every item, canvas coordinates stay unchanged
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
@@ -1,43 +1,23 @@
 import sys
 import os
 import re
+from itertools import islice
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python adj_power.py input_file new_max_power [output_file]")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    try:
-        new_max = int(sys.argv[2])
-    except ValueError:
-        print("Error: new_max_power must be an integer.")
-        sys.exit(1)
-
-    if len(sys.argv) == 4:
-        output_file = sys.argv[3]
-    else:
-        base, ext = os.path.splitext(input_file)
-        output_file = base + '_power' + ext
+WRITE_CHUNK_LINES = 8192  # Output lines joined into a single write
+M3_S_RE = re.compile(r'M3\s*S(\d+)')
+S_RE = re.compile(r'S(\d+)')
 
-    # Find the current max S in M3 commands
+def find_max_s(lines):
+    """Returns the max S value of M3 commands, raises ValueError if there is none"""
     max_s = 0
-    lines = []
     m3_found = False
     
-    try:
-        with open(input_file, 'r') as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        print(f"Error: Input file '{input_file}' not found.")
-        sys.exit(1)
-    
     print("Scanning for M3 commands...")
     for i, line in enumerate(lines):
         # Ищем M3 команды в каждой строке
         if 'M3' in line:
             m3_found = True
-            match = re.search(r'M3\s*S(\d+)', line)
+            match = M3_S_RE.search(line)
             if match:
                 s_val = int(match.group(1))
                 if s_val > max_s:
@@ -45,62 +25,115 @@ def main():
                     print(f"Found M3 at line {i+1} with S{s_val}")
 
     if not m3_found:
-        print("Error: No M3 commands found in the file.")
-        sys.exit(1)
+        raise ValueError("No M3 commands found in the file.")
     if max_s == 0:
-        print("Error: No valid S values found in M3 commands.")
-        sys.exit(1)
+        raise ValueError("No valid S values found in M3 commands.")
 
     print(f"Maximum S value found: {max_s}")
+    return max_s
+
+def adjust_lines(lines, proportion):
+    """Yields the lines with M3 S values scaled and G1 idle moves fixed, looking one line ahead"""
+    # Replacement for S parameters of M3 commands
+    def replace_s(match):
+        old_s = int(match.group(1))
+        new_s = round(old_s * proportion)
+        return f'S{new_s}'
+    
+    laser_on = False  # Track laser state
+    # Each line is scanned for M3/M5/G1 once, the flags roll through the prev/current/next window
+    prev_m5 = False
+    it = iter(lines)
+    line = next(it, None)
+    has_m3 = line is not None and 'M3' in line
+    
+    while line is not None:
+        next_line = next(it, None)
+        next_m3 = next_line is not None and 'M3' in next_line
+        has_m5 = 'M5' in line
+        is_g1 = line.lstrip().startswith('G1')
+        
+        # Update laser state
+        if has_m3:
+            laser_on = True
+        elif has_m5:
+            laser_on = False
+        
+        # Check for erroneous idle move pattern: M5, G1, M3
+        if prev_m5 and is_g1 and next_m3:
+            # Convert G1 to G0 - preserve original formatting
+            yield line.replace('G1', 'G0', 1)
+        # Replace G1 with G0 when laser is off (simple case)
+        elif not laser_on and is_g1:
+            yield line.replace('G1', 'G0', 1)
+        # Scale S parameter in M3 commands
+        elif has_m3:
+            yield S_RE.sub(replace_s, line)
+        else:
+            # Write original line with all formatting preserved
+            yield line
+        
+        prev_m5 = has_m5
+        line = next_line
+        has_m3 = next_m3
+
+def scale_proportion(max_s, new_max):
     proportion = new_max / max_s
     print(f"Proportion for scaling: {proportion:.2f}")
+    return proportion
 
-    # Process the file and write output
+def process(lines, new_max):
+    """Scales S values of M3 commands to the new max power and fixes G1 idle moves, returns the new lines"""
+    new_max = int(new_max)
+    proportion = scale_proportion(find_max_s(lines), new_max)
+    return list(adjust_lines(lines, proportion))
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python adj_power.py input_file new_max_power [output_file]")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
     try:
-        with open(output_file, 'w') as fout:
-            laser_on = False  # Track laser state
-            
-            for i, line in enumerate(lines):
-                original_line = line
-                
-                # Update laser state
-                if 'M3' in line:
-                    laser_on = True
-                elif 'M5' in line:
-                    laser_on = False
-                
-                # Check for erroneous idle move pattern: M5, G1, M3
-                if (i > 0 and i + 1 < len(lines) and
-                    'M5' in lines[i-1] and
-                    line.strip().startswith('G1') and
-                    'M3' in lines[i+1]):
-                    # Convert G1 to G0 - preserve original formatting
-                    new_line = line.replace('G1', 'G0', 1)
-                    fout.write(new_line)
-                    continue
-                
-                # Replace G1 with G0 when laser is off (simple case)
-                if not laser_on and line.strip().startswith('G1'):
-                    new_line = line.replace('G1', 'G0', 1)
-                    fout.write(new_line)
-                # Scale S parameter in M3 commands
-                elif 'M3' in line:
-                    # Use regex to find and replace S parameter
-                    def replace_s(match):
-                        old_s = int(match.group(1))
-                        new_s = round(old_s * proportion)
-                        return f'S{new_s}'
-                    
-                    new_line = re.sub(r'S(\d+)', replace_s, line)
-                    fout.write(new_line)
-                else:
-                    # Write original line with all formatting preserved
-                    fout.write(original_line)
-                    
-    except IOError as e:
-        print(f"Error writing output file: {e}")
+        new_max = int(sys.argv[2])
+    except ValueError:
+        print("Error: new_max_power must be an integer.")
         sys.exit(1)
 
+    if len(sys.argv) == 4:
+        output_file = sys.argv[3]
+    else:
+        base, ext = os.path.splitext(input_file)
+        output_file = base + '_power' + ext
+
+    # Stream the file twice (scan, then rewrite) instead of holding it in memory
+    try:
+        f = open(input_file, 'r')
+    except FileNotFoundError:
+        print(f"Error: Input file '{input_file}' not found.")
+        sys.exit(1)
+
+    with f:
+        try:
+            proportion = scale_proportion(find_max_s(f), new_max)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        f.seek(0)
+
+        # Write output
+        try:
+            with open(output_file, 'w') as fout:
+                out = adjust_lines(f, proportion)
+                while True:
+                    chunk = ''.join(islice(out, WRITE_CHUNK_LINES))
+                    if not chunk:
+                        break
+                    fout.write(chunk)
+        except IOError as e:
+            print(f"Error writing output file: {e}")
+            sys.exit(1)
+
     print(f"Output written to {output_file}")
 
 if __name__ == "__main__":
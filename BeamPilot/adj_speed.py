@@ -1,36 +1,13 @@
 import sys
 import os
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python adj_speed.py input_file new_max_working [new_max_idle] [output_file]")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    try:
-        new_max_working = float(sys.argv[2])
-    except ValueError:
-        print("Error: new_max_working must be a number.")
-        sys.exit(1)
+MOVE_HEADS = ('G0', 'G1')  # Command prefixes whose F values are scaled
 
-    arg_idx = 3
-    new_max_idle = None
-    if len(sys.argv) > arg_idx:
-        try:
-            new_max_idle = float(sys.argv[arg_idx])
-            arg_idx += 1
-        except ValueError:
-            pass  # Next is output_file
-
-    if len(sys.argv) > arg_idx:
-        output_file = sys.argv[arg_idx]
-    else:
-        base, ext = os.path.splitext(input_file)
-        output_file = base + '_speed' + ext
-
-    # Read lines
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
+def process(lines, new_max_working, new_max_idle=None):
+    """Scales F values of G0/G1 lines to the new max working/idle speeds, returns the new lines"""
+    new_max_working = float(new_max_working)
+    if new_max_idle is not None:
+        new_max_idle = float(new_max_idle)
 
     # Find max_working and max_idle
     max_working = 0.0
@@ -43,11 +20,13 @@ def main():
         stripped_code = code_part.strip()
         if not stripped_code:
             continue
-        if stripped_code.startswith('M3'):
+        head = stripped_code[:2]
+        if head == 'M3':
             laser_on = True
-        elif stripped_code.startswith('M5'):
+        elif head == 'M5':
             laser_on = False
-        elif stripped_code.startswith(('G0', 'G1')):
+        elif head in MOVE_HEADS and 'F' in stripped_code:
+            # Only lines with an F word can raise a maximum, the rest are not tokenized here
             parts = stripped_code.split()
             f_val = None
             for p in parts:
@@ -74,78 +53,86 @@ def main():
     prop_working = new_max_working / max_working
     prop_idle = new_max_idle / max_idle if new_max_idle is not None else prop_working
 
-    # Process the file and write output
-    with open(output_file, 'w') as fout:
-        laser_on = False
-        first_g1_in_block = False
-        last_was_m3 = False
-        for line in lines:
-            original_line = line
-            if not line.strip():
-                fout.write(original_line)
-                continue
-
-            # Split comment
-            if ';' in line:
-                code_part, comment = line.split(';', 1)
-                comment = ';' + comment
-            else:
-                code_part = line
-                comment = ''
-
-            stripped_code = code_part.strip()
-            if not stripped_code:
-                fout.write(original_line)
-                continue
-
-            # Update laser state
-            if stripped_code.startswith('M3'):
-                laser_on = True
-                first_g1_in_block = True
-                last_was_m3 = True
-            elif stripped_code.startswith('M5'):
-                laser_on = False
-                last_was_m3 = False
-            elif stripped_code.startswith(('G0', 'G1')) and last_was_m3:
-                first_g1_in_block = True
-                last_was_m3 = False
-            elif stripped_code.startswith(('G0', 'G1')):
-                last_was_m3 = False
-                if stripped_code.startswith('G1') and laser_on:
-                    first_g1_in_block = False
-
-            # Determine if needs modification
-            new_code = None
-            if stripped_code.startswith(('G0', 'G1')):
-                prop = None
-                convert_to_g0 = False
-                ensure_f = False
-                if stripped_code.startswith('G1') and not laser_on:
-                    convert_to_g0 = True
-                    prop = prop_idle
-                    ensure_f = True
-                elif stripped_code.startswith('G0'):
-                    prop = prop_idle
-                    ensure_f = True
-                elif stripped_code.startswith('G1') and laser_on and first_g1_in_block:
-                    prop = prop_working
-                    ensure_f = True
-                elif stripped_code.startswith('G1') and laser_on:
-                    prop = prop_working
-                    ensure_f = False  # Only first G1 in block needs F
-
-                if prop is not None:
-                    # Calculate leading and trailing
-                    leading = code_part[:len(code_part) - len(code_part.lstrip())]
-                    temp = code_part.lstrip()
-                    trailing = temp[len(stripped_code):]
-
-                    # Modify parts
-                    parts = stripped_code.split()
-                    new_parts = [parts[0]]
-                    if convert_to_g0:
-                        new_parts[0] = 'G0'
-                    has_f = False
+    # Process the lines
+    out = []
+    laser_on = False
+    first_g1_in_block = False
+    last_was_m3 = False
+    for line in lines:
+        original_line = line
+        if not line.strip():
+            out.append(original_line)
+            continue
+
+        # Split comment
+        if ';' in line:
+            code_part, comment = line.split(';', 1)
+            comment = ';' + comment
+        else:
+            code_part = line
+            comment = ''
+
+        stripped_code = code_part.strip()
+        if not stripped_code:
+            out.append(original_line)
+            continue
+
+        # The command prefix is taken once, the checks below compare it
+        head = stripped_code[:2]
+        is_move = head in MOVE_HEADS
+
+        # Update laser state
+        if head == 'M3':
+            laser_on = True
+            first_g1_in_block = True
+            last_was_m3 = True
+        elif head == 'M5':
+            laser_on = False
+            last_was_m3 = False
+        elif is_move and last_was_m3:
+            first_g1_in_block = True
+            last_was_m3 = False
+        elif is_move:
+            last_was_m3 = False
+            if head == 'G1' and laser_on:
+                first_g1_in_block = False
+
+        # Determine if needs modification
+        new_code = None
+        if is_move:
+            prop = None
+            convert_to_g0 = False
+            ensure_f = False
+            if head == 'G1' and not laser_on:
+                convert_to_g0 = True
+                prop = prop_idle
+                ensure_f = True
+            elif head == 'G0':
+                prop = prop_idle
+                ensure_f = True
+            elif head == 'G1' and laser_on and first_g1_in_block:
+                prop = prop_working
+                ensure_f = True
+            elif head == 'G1' and laser_on:
+                prop = prop_working
+                ensure_f = False  # Only first G1 in block needs F
+
+            if prop is not None:
+                # Calculate leading and trailing
+                lstripped = code_part.lstrip()
+                leading = code_part[:len(code_part) - len(lstripped)]
+                trailing = lstripped[len(stripped_code):]
+
+                # Modify parts
+                parts = stripped_code.split()
+                new_parts = [parts[0]]
+                if convert_to_g0:
+                    new_parts[0] = 'G0'
+                has_f = False
+                if 'F' not in stripped_code:
+                    # Words other than F are copied as is
+                    new_parts.extend(parts[1:])
+                else:
                     for p in parts[1:]:
                         if p.startswith('F'):
                             try:
@@ -157,17 +144,56 @@ def main():
                                 new_parts.append(p)
                         else:
                             new_parts.append(p)
-                    # Ensure F parameter if needed
-                    if ensure_f and not has_f:
-                        new_parts.append(f'F{new_max_idle if new_parts[0] == "G0" or not laser_on else new_max_working:.2f}')
-                    new_stripped = ' '.join(new_parts)
+                # Ensure F parameter if needed
+                if ensure_f and not has_f:
+                    new_parts.append(f'F{new_max_idle if new_parts[0] == "G0" or not laser_on else new_max_working:.2f}')
+                new_stripped = ' '.join(new_parts)
+
+                new_code = leading + new_stripped + trailing
+
+        if new_code is not None:
+            out.append(new_code + comment)
+        else:
+            out.append(original_line)
+
+    return out
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python adj_speed.py input_file new_max_working [new_max_idle] [output_file]")
+        sys.exit(1)
 
-                    new_code = leading + new_stripped + trailing
+    input_file = sys.argv[1]
+    try:
+        new_max_working = float(sys.argv[2])
+    except ValueError:
+        print("Error: new_max_working must be a number.")
+        sys.exit(1)
 
-            if new_code is not None:
-                fout.write(new_code + comment)
-            else:
-                fout.write(original_line)
+    arg_idx = 3
+    new_max_idle = None
+    if len(sys.argv) > arg_idx:
+        try:
+            new_max_idle = float(sys.argv[arg_idx])
+            arg_idx += 1
+        except ValueError:
+            pass  # Next is output_file
+
+    if len(sys.argv) > arg_idx:
+        output_file = sys.argv[arg_idx]
+    else:
+        base, ext = os.path.splitext(input_file)
+        output_file = base + '_speed' + ext
+
+    # Read lines
+    with open(input_file, 'r') as f:
+        lines = f.readlines()
+
+    out = process(lines, new_max_working, new_max_idle)
+
+    # Write output in a single call
+    with open(output_file, 'w') as fout:
+        fout.write(''.join(out))
 
 if __name__ == "__main__":
     main()
@@ -2,40 +2,34 @@
 """
 G-code power control fix script
 Usage: python fix_power.py input_file [power] [output_file]
+
+Can also be imported: process(lines, power) returns the fixed lines.
 """
 
 import sys
 import os
 
-def fix_gcode_power(input_file, power=255, output_file=None):
+LASER_PREFIXES = ('M3', 'M106', 'M107', 'M5')  # Commands that already set the laser after a G0 run
+
+def fix_gcode_lines(lines, power=255):
     """
-    Fixes G-code by adding laser power control commands
+    Adds laser power control commands around G0 travel sequences
     
     Args:
-        input_file: path to input file
+        lines: G-code lines (newline-terminated, as returned by readlines)
         power: laser power (0-255)
-        output_file: path to output file (if None, generated automatically)
-    """
-    
-    # Generate output filename if not specified
-    if output_file is None:
-        base_name, ext = os.path.splitext(input_file)
-        output_file = f"{base_name}_fixed{ext}"
-    
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-    except UnicodeDecodeError:
-        # Try different encoding if UTF-8 fails
-        with open(input_file, 'r', encoding='latin-1') as f:
-            lines = f.readlines()
     
+    Returns:
+        list of fixed G-code lines
+    """
     fixed_lines = []
     i = 0
     n = len(lines)
+    # Every line is stripped once, the G0 run scan and the look-ahead reuse it
+    stripped = [line.strip() for line in lines]
     
     while i < n:
-        line = lines[i].strip()
+        line = stripped[i]
         
         # If current line is G0 (travel move)
         if line.startswith('G0'):
@@ -43,7 +37,7 @@ def fix_gcode_power(input_file, power=255, output_file=None):
             g0_start = i
             
             # Find end of G0 sequence
-            while i < n and (lines[i].strip().startswith('G0') or lines[i].strip() == ''):
+            while i < n and (stripped[i].startswith('G0') or stripped[i] == ''):
                 i += 1
             
             # Add M5 before first G0 line
@@ -51,18 +45,14 @@ def fix_gcode_power(input_file, power=255, output_file=None):
             # Preserve original line indentation
             indent = first_g0_line[:len(first_g0_line) - len(first_g0_line.lstrip())]
             fixed_lines.append(f"{indent}M5\n")
-            fixed_lines.append(first_g0_line)
             
-            # Add remaining G0 lines
-            for j in range(g0_start + 1, i):
-                fixed_lines.append(lines[j])
+            # Add the G0 lines
+            fixed_lines.extend(lines[g0_start:i])
             
             # Add M3 S### after last G0 line
             if i < n:  # If there's a next line after G0
                 # Check if next line is already a laser command
-                next_line = lines[i].strip()
-                if not (next_line.startswith('M3') or next_line.startswith('M106') or 
-                       next_line.startswith('M107') or next_line.startswith('M5')):
+                if not stripped[i].startswith(LASER_PREFIXES):
                     # Preserve next line's indentation
                     next_indent = lines[i][:len(lines[i]) - len(lines[i].lstrip())]
                     fixed_lines.append(f"{next_indent}M3 S{power}\n")
@@ -72,6 +62,51 @@ def fix_gcode_power(input_file, power=255, output_file=None):
             fixed_lines.append(lines[i])
             i += 1
     
+    return fixed_lines
+
+def parse_power(value):
+    """Converts power argument to an integer in 0-255 range (out of range values become 255)"""
+    try:
+        power = int(value)
+    except ValueError:
+        raise ValueError("power must be an integer")
+    if not (0 <= power <= 255):
+        print("Warning: power must be between 0-255, using 255")
+        power = 255
+    return power
+
+def process(lines, power=255):
+    """In-process entry point: fixes G-code lines, power is validated as on the command line"""
+    power = parse_power(power)
+    fixed_lines = fix_gcode_lines(lines, power)
+    print(f"Laser power set to: S{power}")
+    return fixed_lines
+
+def fix_gcode_power(input_file, power=255, output_file=None):
+    """
+    Fixes G-code by adding laser power control commands
+    
+    Args:
+        input_file: path to input file
+        power: laser power (0-255)
+        output_file: path to output file (if None, generated automatically)
+    """
+    
+    # Generate output filename if not specified
+    if output_file is None:
+        base_name, ext = os.path.splitext(input_file)
+        output_file = f"{base_name}_fixed{ext}"
+    
+    try:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except UnicodeDecodeError:
+        # Try different encoding if UTF-8 fails
+        with open(input_file, 'r', encoding='latin-1') as f:
+            lines = f.readlines()
+    
+    fixed_lines = fix_gcode_lines(lines, power)
+    
     # Write fixed code to output file
     with open(output_file, 'w', encoding='utf-8') as f:
         f.writelines(fixed_lines)
@@ -99,12 +134,9 @@ def main():
     power = 255
     if len(sys.argv) >= 3:
         try:
-            power = int(sys.argv[2])
-            if not (0 <= power <= 255):
-                print("Warning: power must be between 0-255, using 255")
-                power = 255
-        except ValueError:
-            print("Error: power must be an integer")
+            power = parse_power(sys.argv[2])
+        except ValueError as e:
+            print(f"Error: {e}")
             sys.exit(1)
     
     # Process output file parameter
@@ -10,21 +10,21 @@ Reorders cutting segments in G-code to minimize idle travel.
 
 Usage:
     python3 optimize_gcode.py input.gcode [output.gcode] [--level 0|1|2]
+
+In-process use: process(lines, level) returns the optimized lines.
 """
 
 import sys
 import re
-from math import hypot
+from math import dist, sqrt
 import time
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
 
 # --------------- Parsing ---------------
 
 G_MOVE_RE = re.compile(r'^(G0|G00|G1|G01)\b', re.IGNORECASE)
-COORD_RE = re.compile(r'([XY])\s*([+-]?\d+\.?\d*)', re.IGNORECASE)
-F_RE = re.compile(r'F\s*([+-]?\d+\.?\d*)', re.IGNORECASE)
+WORD_RE = re.compile(r'([XYF])\s*([+-]?\d+\.?\d*)', re.IGNORECASE)  # X, Y and F words in one scan
 G90_RE = re.compile(r'\bG90\b', re.IGNORECASE)
 G91_RE = re.compile(r'\bG91\b', re.IGNORECASE)
 M3_RE = re.compile(r'\bM3\b', re.IGNORECASE)
@@ -33,11 +33,6 @@ M5_RE = re.compile(r'\bM5\b', re.IGNORECASE)
 HUGE_FILE = 10000
 BIG_FILE = 3000
 
-def is_g_move(line):
-    """Quick check for G-code movement command"""
-    stripped = line.strip().upper()
-    return bool(G_MOVE_RE.match(stripped))
-
 def parse_gcode_lines(lines):
     """
     Splits G-code file into preamble, list of segments (each segment is a dict with 'lines' and 'points'),
@@ -66,13 +61,15 @@ def parse_gcode_lines(lines):
     for idx, raw in enumerate(lines):
         line = raw.rstrip('\n')
         stripped = line.strip()
-        upper = stripped.upper()
 
-        # Update modal absolute/relative if found
-        if G90_RE.search(upper):
-            absolute = True
-        if G91_RE.search(upper):
-            absolute = False
+        # Update modal absolute/relative if found; substring checks screen out most lines
+        # before the word-boundary regexes run. The regexes ignore case, so no upper-cased
+        # copy of the line is made
+        if 'G9' in stripped or 'g9' in stripped:
+            if G90_RE.search(stripped):
+                absolute = True
+            if G91_RE.search(stripped):
+                absolute = False
 
         # Strip inline comment after ';' (keep full original line for output)
         no_comment = stripped
@@ -80,7 +77,7 @@ def parse_gcode_lines(lines):
             no_comment = stripped.split(';', 1)[0].strip()
 
         # Check for M3/M5
-        if M3_RE.search(upper):
+        if ('M3' in stripped or 'm3' in stripped) and M3_RE.search(stripped):
             laser_mode = True
             laser_on = True
             if not in_segment:
@@ -93,7 +90,7 @@ def parse_gcode_lines(lines):
                     seg_lines.append(line)
             continue
 
-        if M5_RE.search(upper):
+        if ('M5' in stripped or 'm5' in stripped) and M5_RE.search(stripped):
             laser_mode = True
             laser_on = False
             if in_segment:
@@ -104,13 +101,21 @@ def parse_gcode_lines(lines):
                 seg_points = []
             continue
 
-        # Quick check for G-code movement command
-        if is_g_move(no_comment):
-            move = G_MOVE_RE.match(no_comment.upper()).group(1).upper()
-            coords = {m.group(1).upper(): float(m.group(2)) for m in COORD_RE.finditer(no_comment)}
-            f_match = F_RE.search(no_comment)
-            if f_match:
-                current_F = float(f_match.group(1))
+        # Quick check for G-code movement command (no_comment is already stripped)
+        move_match = G_MOVE_RE.match(no_comment)
+        if move_match:
+            move = move_match.group(1).upper()
+            # Last X/Y word wins, the first F word sets the feedrate
+            coords = {}
+            f_value = None
+            for word, value in WORD_RE.findall(no_comment):
+                word = word.upper()
+                if word != 'F':
+                    coords[word] = float(value)
+                elif f_value is None:
+                    f_value = value
+            if f_value is not None:
+                current_F = float(f_value)
 
             is_idle = (move in ('G0', 'G00')) or (laser_mode and not laser_on and move in ('G1', 'G01'))
 
@@ -175,9 +180,7 @@ def parse_gcode_lines(lines):
 
 # -------------- Optimization Utilities --------------
 
-def dist(a, b):
-    """Calculate Euclidean distance between two points"""
-    return hypot(a[0] - b[0], a[1] - b[1])
+# dist(a, b) is math.dist: Euclidean distance between two points, computed in C
 
 def dist_sq(a, b):
     """Calculate squared distance for faster comparisons"""
@@ -185,181 +188,359 @@ def dist_sq(a, b):
     dy = a[1] - b[1]
     return dx*dx + dy*dy
 
-def total_travel(ordered_segments):
-    """Calculate total travel distance between segments"""
-    if not ordered_segments:
-        return 0.0
+def endpoint_tables(segments):
+    """
+    Builds the endpoint tables the optimizer works on. A segment in an order is an int id,
+    id = 2*index for the segment as parsed and id ^ 1 for it reversed, so flipping needs no
+    new dicts. heads[id] and tails[id] are the first and last points of that oriented segment.
+    """
+    heads = []
+    tails = []
+    for seg in segments:
+        first = seg['points'][0]
+        last = seg['points'][-1]
+        heads += (first, last)
+        tails += (last, first)
+    return heads, tails
+
+def oriented_segments(segments, order):
+    """Turns an order of oriented ids back into segment dicts, reversing the flipped ones"""
+    result = []
+    for sid in order:
+        seg = segments[sid >> 1]
+        if sid & 1:
+            seg = {
+                'points': seg['points'][::-1],
+                'lines': seg['lines'][::-1]
+            }
+        result.append(seg)
+    return result
+
+def travel_between(order, heads, tails, lo, hi):
+    """Travel distance of the idle moves into positions lo..hi-1 of the order"""
     total = 0.0
-    for i in range(len(ordered_segments) - 1):
-        a = ordered_segments[i]['points'][-1]
-        b = ordered_segments[i+1]['points'][0]
-        total += dist(a, b)
+    prev_end = tails[order[lo-1]]
+    for k in range(lo, hi):
+        sid = order[k]
+        total += dist(prev_end, heads[sid])
+        prev_end = tails[sid]
     return total
 
+def total_travel(order, heads, tails):
+    """Calculate total travel distance between segments"""
+    if not order:
+        return 0.0
+    return travel_between(order, heads, tails, 1, len(order))
+
 # -------------- Order Optimization --------------
 
+def build_endpoint_grid(indices, starts, ends):
+    """
+    Buckets the start and end points of the given segments into a uniform grid
+    (about one segment per cell) for nearest-endpoint queries.
+    """
+    xs = [starts[i][0] for i in indices] + [ends[i][0] for i in indices]
+    ys = [starts[i][1] for i in indices] + [ends[i][1] for i in indices]
+    min_x, min_y = min(xs), min(ys)
+    w, h = max(xs) - min_x, max(ys) - min_y
+    if w > 0 and h > 0:
+        cell = sqrt(w * h / len(indices))
+    else:
+        cell = max(w, h) / len(indices)
+    if cell <= 0:
+        cell = 1.0
+
+    cells = {}
+    for i in indices:
+        for orient, (x, y) in ((False, starts[i]), (True, ends[i])):
+            key = (int((x - min_x) // cell), int((y - min_y) // cell))
+            cells.setdefault(key, []).append((i, orient, x, y))
+
+    return {
+        'cells': cells,
+        'cell': cell,
+        'min_x': min_x,
+        'min_y': min_y,
+        'nx': int(w // cell) + 1,
+        'ny': int(h // cell) + 1,
+        'size': len(indices),
+    }
+
+def nearest_endpoint(grid, point, alive):
+    """
+    Returns (index, reversed) of the alive segment endpoint nearest to point.
+    Ties go to the lowest index and to the start point, like a linear scan in order.
+    Cells are searched in growing square rings until no closer point can remain.
+    """
+    cells = grid['cells']
+    cell = grid['cell']
+    nx, ny = grid['nx'], grid['ny']
+    px, py = point
+    cx = int((px - grid['min_x']) // cell)
+    cy = int((py - grid['min_y']) // cell)
+    max_r = max(cx, nx - 1 - cx, cy, ny - 1 - cy)
+
+    best = None  # (d_sq, index, orient)
+    r = 0
+    while r <= max_r:
+        x_lo, x_hi = max(cx - r, 0), min(cx + r, nx - 1)
+        y_lo, y_hi = max(cy - r, 0), min(cy + r, ny - 1)
+        for gx in range(x_lo, x_hi + 1):
+            # Only the border of the ring, inner cells were searched before
+            if gx == cx - r or gx == cx + r:
+                gys = range(y_lo, y_hi + 1)
+            else:
+                gys = [gy for gy in (cy - r, cy + r) if y_lo <= gy <= y_hi]
+            for gy in gys:
+                for i, orient, x, y in cells.get((gx, gy), ()):
+                    if alive[i]:
+                        dx = px - x
+                        dy = py - y
+                        cand = (dx*dx + dy*dy, i, orient)
+                        if best is None or cand < best:
+                            best = cand
+        # Points outside the searched rings are at least r cells away (with a margin for rounding)
+        if best is not None:
+            limit = r * cell * 0.999999
+            if best[0] < limit * limit:
+                break
+        r += 1
+
+    return best[1], best[2]
+
 def greedy_order_with_reversal_fast(segments):
-    """Fast greedy algorithm with precomputed endpoints"""
+    """
+    Fast greedy algorithm, nearest endpoints are looked up in a grid index.
+    Returns the order as oriented segment ids (see endpoint_tables).
+    """
     if not segments:
         return []
 
-    unused = segments[:]
-    ordered = [unused.pop(0)]
+    ordered = [0]
+    total_segments = len(segments)
     
     # Precompute all segment endpoints
-    endpoints = []
-    for seg in unused:
-        endpoints.append((seg['points'][0], seg['points'][-1]))
-    
-    total_segments = len(segments)
+    starts = [seg['points'][0] for seg in segments]
+    ends = [seg['points'][-1] for seg in segments]
+    alive = bytearray(b'\x01') * total_segments
+    alive[0] = 0
+    remaining = total_segments - 1
+    grid = build_endpoint_grid(range(1, total_segments), starts, ends) if remaining else None
     
-    while unused:
+    while remaining:
         if len(ordered) % 100 == 0:
             print(f"Greedy progress: {len(ordered)} / {total_segments}")
             
-        last_end = ordered[-1]['points'][-1]
-        best_idx = 0
-        best_orient = False
-        best_d_sq = float('inf')
-        
-        for i, (start, end) in enumerate(endpoints):
-            d_start_sq = dist_sq(last_end, start)
-            d_end_sq = dist_sq(last_end, end)
-            
-            if d_start_sq < best_d_sq:
-                best_d_sq = d_start_sq
-                best_idx = i
-                best_orient = False
-            if d_end_sq < best_d_sq:
-                best_d_sq = d_end_sq
-                best_idx = i
-                best_orient = True
-        
-        # Update endpoints and move segment
-        seg = unused.pop(best_idx)
-        endpoints.pop(best_idx)
+        sid = ordered[-1]
+        last_end = starts[sid >> 1] if sid & 1 else ends[sid >> 1]
+        best_idx, best_orient = nearest_endpoint(grid, last_end, alive)
         
-        if best_orient:
-            seg = {
-                'points': seg['points'][::-1],
-                'lines': seg['lines'][::-1]
-            }
-        
-        ordered.append(seg)
+        # Mark the segment used and move it
+        alive[best_idx] = 0
+        remaining -= 1
+        ordered.append(2 * best_idx + best_orient)
+
+        # Rebuild over the remaining endpoints once half are used, so searches do not walk empty cells
+        if remaining and remaining * 2 <= grid['size']:
+            grid = build_endpoint_grid([i for i in range(total_segments) if alive[i]], starts, ends)
     
     return ordered
 
-def optimize_orientation(order, i, j):
+def optimize_orientation(order, i, j, heads, tails):
     """Optimize orientation between two adjacent segments"""
     if j >= len(order):
         return
     
-    prev_end = order[i]['points'][-1]
-    seg = order[j]
+    prev_end = tails[order[i]]
+    sid = order[j]
     
-    d0 = dist(prev_end, seg['points'][0])
-    d1 = dist(prev_end, seg['points'][-1])
+    d0 = dist(prev_end, heads[sid])
+    d1 = dist(prev_end, tails[sid])
     
     if d1 < d0:
-        order[j] = {
-            'points': seg['points'][::-1],
-            'lines': seg['lines'][::-1]
-        }
+        order[j] = sid ^ 1
 
-def fast_local_improve(order, max_attempts=500):
-    """Fast local improvement with random swaps and reversals"""
+def mutate_window(order, i, j, heads, tails):
+    """
+    Applies a random swap or reversal of positions i..j and fixes orientations around it.
+    Only order[lo:hi] can change, so that window is copied and mutated instead of the
+    whole order. Returns (lo, hi, window, travel delta); commit with order[lo:hi] = window.
+    """
+    n = len(order)
+    lo = max(0, i-1)
+    hi = min(n, j+3)
+    window = order[lo:hi]
+    wi, wj = i - lo, j - lo
+
+    # Randomly choose mutation type
+    if random.random() < 0.7:  # 70% swap, 30% reverse
+        window[wi], window[wj] = window[wj], window[wi]
+    else:
+        window[wi:wj+1] = window[wi:wj+1][::-1]
+
+    # Optimize orientation around modified area
+    for k in range(1, min(n, j+2) - lo):
+        optimize_orientation(window, k-1, k, heads, tails)
+
+    # Position lo keeps its orientation unless it is 0, so only moves inside the window change
+    delta = travel_between(window, heads, tails, 1, len(window)) - travel_between(order, heads, tails, lo + 1, hi)
+    return lo, hi, window, delta
+
+def two_opt_delta(order, i, j, heads, tails):
+    """
+    Travel change from reversing positions i..j together with each segment in it.
+    Moves inside the reversed run keep their length, so only the two boundary moves count.
+    """
+    first_start = heads[order[i]]
+    last_end = tails[order[j]]
+    delta = 0.0
+    if i > 0:
+        prev_end = tails[order[i-1]]
+        delta += dist(prev_end, last_end) - dist(prev_end, first_start)
+    if j < len(order) - 1:
+        next_start = heads[order[j+1]]
+        delta += dist(first_start, next_start) - dist(last_end, next_start)
+    return delta
+
+def reverse_span(order, i, j):
+    """Reverses positions i..j in place, flipping the direction of every segment"""
+    order[i:j+1] = [sid ^ 1 for sid in reversed(order[i:j+1])]
+
+OR_OPT_MAX_CHAIN = 3  # Longest run of segments an Or-opt move relocates
+
+def or_opt_delta(order, i, k, p, heads, tails):
+    """
+    Travel change from moving the k segments at positions i..i+k-1 to just after position p
+    (p outside the run and not i-1). Returns (delta, flip), flip telling whether the run
+    is cheaper to insert reversed. Only the three moves around the run and the target change.
+    """
+    n = len(order)
+    first = order[i]
+    last = order[i+k-1]
+    first_start = heads[first]
+    last_end = tails[last]
+    delta = 0.0
+
+    # Close the gap the run leaves
+    prev_end = tails[order[i-1]] if i > 0 else None
+    next_start = heads[order[i+k]] if i + k < n else None
+    if prev_end is not None:
+        delta -= dist(prev_end, first_start)
+    if next_start is not None:
+        delta -= dist(last_end, next_start)
+    if prev_end is not None and next_start is not None:
+        delta += dist(prev_end, next_start)
+
+    # Open the target gap and insert the run either way round
+    target_end = tails[order[p]]
+    forward = dist(target_end, first_start)
+    backward = dist(target_end, last_end)
+    if p + 1 < n:
+        target_next = heads[order[p+1]]
+        delta -= dist(target_end, target_next)
+        forward += dist(last_end, target_next)
+        backward += dist(first_start, target_next)
+
+    if backward < forward:
+        return delta + backward, True
+    return delta + forward, False
+
+def relocate_run(order, i, k, p, flip):
+    """Moves positions i..i+k-1 to just after position p, reversing them if flip"""
+    run = order[i:i+k]
+    if flip:
+        run = [sid ^ 1 for sid in reversed(run)]
+    del order[i:i+k]
+    pos = p + 1 if p < i else p + 1 - k
+    order[pos:pos] = run
+
+def fast_local_improve(order, heads, tails, max_attempts=20000):
+    """Fast local improvement with random 2-opt and Or-opt (run relocation) moves"""
     n = len(order)
     if n < 3:
         return order, False
     
-    current_score = total_travel(order)
+    order = order.copy()
+    current_score = total_travel(order, heads, tails)
     improved = False
+    rand = random.random
     
     for attempt in range(max_attempts):
-        i = random.randint(0, n-2)
-        j = random.randint(i+1, n-1)
-        
-        # Create new sequence
-        new_order = order.copy()
-        
-        # Randomly choose mutation type
-        if random.random() < 0.7:  # 70% swap, 30% reverse
-            new_order[i], new_order[j] = new_order[j], new_order[i]
+        if rand() < 0.5:
+            # 2-opt: two random positions, cheaper than a pair of randint calls
+            i = int(rand() * n)
+            j = int(rand() * n)
+            if i == j:
+                continue
+            if i > j:
+                i, j = j, i
+            
+            delta = two_opt_delta(order, i, j, heads, tails)
+            
+            if delta < -1e-9:
+                reverse_span(order, i, j)
+            else:
+                continue
         else:
-            new_order[i:j+1] = new_order[i:j+1][::-1]
-        
-        # Optimize orientation around modified area
-        start_idx = max(0, i-1)
-        end_idx = min(n, j+2)
-        
-        for k in range(start_idx + 1, end_idx):
-            if k < n:
-                optimize_orientation(new_order, k-1, k)
-        
-        new_score = total_travel(new_order)
+            # Or-opt: relocate a run of 1..OR_OPT_MAX_CHAIN segments after a random position
+            k = 1 + int(rand() * OR_OPT_MAX_CHAIN)
+            if k >= n:
+                continue
+            i = int(rand() * (n - k + 1))
+            p = int(rand() * n)
+            if i - 1 <= p <= i + k - 1:
+                continue
+            
+            delta, flip = or_opt_delta(order, i, k, p, heads, tails)
+            
+            if delta < -1e-9:
+                relocate_run(order, i, k, p, flip)
+            else:
+                continue
         
-        if new_score < current_score - 1e-9:
-            order = new_order
-            current_score = new_score
-            improved = True
-            print(f"Local improvement found: {new_score:.3f}")
+        current_score += delta
+        improved = True
+        print(f"Local improvement found: {current_score:.3f}")
     
     return order, improved
 
-def parallel_local_improve(order, num_threads=4, max_attempts_per_thread=200):
-    """Parallel local improvement with multiple threads"""
+def parallel_local_improve(order, heads, tails, num_tries=4, max_attempts_per_try=200):
+    """
+    Local improvement with several independent tries from the same order, the best one wins.
+    The tries run one after another: they are pure Python, so worker threads only added
+    scheduling overhead under the GIL.
+    """
     n = len(order)
     if n < 3:
         return order, False
     
-    def try_improvement(thread_id):
+    base_score = total_travel(order, heads, tails)
+    best_order = order
+    best_improved = False
+    best_score = base_score
+    
+    for try_num in range(num_tries):
         local_order = order.copy()
-        local_improved = False
-        local_best_score = total_travel(order)
+        local_score = base_score
         
-        for attempt in range(max_attempts_per_thread):
+        for attempt in range(max_attempts_per_try):
             i = random.randint(0, n-2)
             j = random.randint(i+1, n-1)
             
-            # Apply mutation
-            if random.random() < 0.7:
-                local_order[i], local_order[j] = local_order[j], local_order[i]
-            else:
-                local_order[i:j+1] = local_order[i:j+1][::-1]
-            
-            # Optimize orientation
-            start_idx = max(0, i-1)
-            end_idx = min(n, j+2)
-            for k in range(start_idx + 1, end_idx):
-                if k < n:
-                    optimize_orientation(local_order, k-1, k)
-            
-            new_score = total_travel(local_order)
+            # Mutations accumulate until one ends up below the starting score
+            lo, hi, window, delta = mutate_window(local_order, i, j, heads, tails)
+            local_order[lo:hi] = window
+            local_score += delta
             
-            if new_score < local_best_score - 1e-9:
-                local_best_score = new_score
-                local_improved = True
+            if local_score < base_score - 1e-9:
                 break
         
-        return local_order, local_improved
+        if local_score < base_score - 1e-9 and local_score < best_score:
+            best_order = local_order
+            best_score = local_score
+            best_improved = True
     
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:
-        futures = [executor.submit(try_improvement, i) for i in range(num_threads)]
-        
-        best_order = order
-        best_improved = False
-        best_score = total_travel(order)
-        
-        for future in as_completed(futures):
-            result, improved = future.result()
-            if improved:
-                result_score = total_travel(result)
-                if result_score < best_score:
-                    best_order = result
-                    best_score = result_score
-                    best_improved = True
-        
-        return best_order, best_improved
+    return best_order, best_improved
 
 def optimize_segments(segments, level=None, max_iter=20, max_time=180):
     """Optimized segment reordering with configurable optimization level"""
@@ -383,12 +564,13 @@ def optimize_segments(segments, level=None, max_iter=20, max_time=180):
     if level == 0:
         print("Using fast greedy algorithm only")
         order = greedy_order_with_reversal_fast(segments)
-        return order
+        return oriented_segments(segments, order)
 
-    # Level 1: Greedy + parallel local improvements
+    # Level 1: Greedy + multi-try local improvements
     # Level 2: Greedy + iterative local improvements
     order = greedy_order_with_reversal_fast(segments)
-    initial_travel = total_travel(order)
+    heads, tails = endpoint_tables(segments)
+    initial_travel = total_travel(order, heads, tails)
     print(f"Initial greedy travel: {initial_travel:.3f}")
 
     # Local improvements
@@ -405,53 +587,81 @@ def optimize_segments(segments, level=None, max_iter=20, max_time=180):
         print(f"Starting improvement iteration {iter_num}")
         
         if level == 1:
-            order, improved = parallel_local_improve(order)
+            order, improved = parallel_local_improve(order, heads, tails)
         else:  # level == 2
-            order, improved = fast_local_improve(order)
+            order, improved = fast_local_improve(order, heads, tails)
         
         if improved:
-            current_travel = total_travel(order)
+            current_travel = total_travel(order, heads, tails)
             print(f"Iteration {iter_num}: travel = {current_travel:.3f}")
 
-    final_travel = total_travel(order)
+    final_travel = total_travel(order, heads, tails)
     print(f"Optimization done in {iter_num} iterations. Final travel = {final_travel:.3f}")
     # Avoid division by zero when initial_travel is 0 (e.g., single segment)
     improvement = 0.0 if initial_travel == 0 else ((initial_travel - final_travel) / initial_travel * 100)
     print(f"Improvement: {improvement:.1f}%")
     
-    return order
+    return oriented_segments(segments, order)
 
 # -------------- G-code Generation --------------
 
 def generate_gcode(preamble, ordered_segments, epilogue, laser_mode, idle_F):
     """
-    Generates optimized G-code:
+    Generates optimized G-code as newline-terminated lines:
     - Writes preamble
     - Adds idle moves to segment start points (G0 or M5 + G1 F<idle_F>)
     - Outputs original segment lines (including M3/M5, etc.)
     - Appends epilogue
+    The lines are returned as a list ready for writelines, without joining them into one string.
     """
-    out = []
+    out = [line + '\n' for line in preamble]
     current_pos = (None, None)
 
-    out.extend(preamble)
+    # Everything before the coordinates of an idle move is the same for the whole file
+    idle_prefix = f"G1 F{idle_F:.1f} " if laser_mode else "G0 "
 
     for seg in ordered_segments:
         seg_start = seg['points'][0]
         if current_pos[0] is None or (abs(current_pos[0] - seg_start[0]) > 1e-6 or abs(current_pos[1] - seg_start[1]) > 1e-6):
-            if not laser_mode:
-                out.append(f"G0 X{seg_start[0]:.4f} Y{seg_start[1]:.4f}")
-            else:
-                out.append("M5")
-                out.append(f"G1 F{idle_F:.1f} X{seg_start[0]:.4f} Y{seg_start[1]:.4f}")
-        out.extend(seg['lines'])
+            if laser_mode:
+                out.append("M5\n")
+            out.append(f"{idle_prefix}X{seg_start[0]:.4f} Y{seg_start[1]:.4f}\n")
+        out.extend([line + '\n' for line in seg['lines']])
         current_pos = seg['points'][-1]
 
-    out.extend(epilogue)
-    return '\n'.join(out) + '\n'
+    out.extend([line + '\n' for line in epilogue])
+    return out
 
 # ---------------- Main ----------------
 
+def process(lines, level=None):
+    """
+    Optimizes G-code lines in memory and returns the resulting lines (newline-terminated).
+    Returns the input lines unchanged when there are no cutting segments.
+    """
+    if level is not None:
+        level = int(level)
+
+    parse_time = time.time()
+    preamble, segments, epilogue, laser_mode, idle_F = parse_gcode_lines(lines)
+    parse_time = time.time() - parse_time
+    
+    print(f"Parsed in {parse_time:.2f}s: {len(preamble)} preamble, {len(segments)} segments, {len(epilogue)} epilogue")
+    print(f"Laser mode detected: {laser_mode}")
+
+    if not segments:
+        print("No cutting segments found. Keeping original G-code.")
+        return lines
+
+    # Optimization
+    opt_time = time.time()
+    ordered = optimize_segments(segments, level=level)
+    opt_time = time.time() - opt_time
+    print(f"Optimization completed in {opt_time:.2f}s")
+
+    # Generate result
+    return generate_gcode(preamble, ordered, epilogue, laser_mode, idle_F)
+
 def main():
     parser = argparse.ArgumentParser(description="Optimize G-code to minimize idle travel")
     parser.add_argument("input", help="Input G-code file")
@@ -469,32 +679,10 @@ def main():
     with open(input_path, 'r', encoding='utf-8', errors='ignore') as f:
         lines = f.readlines()
 
-    parse_time = time.time()
-    preamble, segments, epilogue, laser_mode, idle_F = parse_gcode_lines(lines)
-    parse_time = time.time() - parse_time
-    
-    print(f"Parsed in {parse_time:.2f}s: {len(preamble)} preamble, {len(segments)} segments, {len(epilogue)} epilogue")
-    print(f"Laser mode detected: {laser_mode}")
-
-    if not segments:
-        print("No cutting segments found. Writing original file.")
-        with open(output_path, 'w', encoding='utf-8') as fw:
-            fw.writelines(lines)
-        return
-
-    # Optimization
-    opt_time = time.time()
-    ordered = optimize_segments(segments, level=opt_level)
-    opt_time = time.time() - opt_time
-    print(f"Optimization completed in {opt_time:.2f}s")
-
-    # Generate result
-    gen_time = time.time()
-    optimized_text = generate_gcode(preamble, ordered, epilogue, laser_mode, idle_F)
-    gen_time = time.time() - gen_time
+    optimized_lines = process(lines, level=opt_level)
     
     with open(output_path, 'w', encoding='utf-8') as fw:
-        fw.write(optimized_text)
+        fw.writelines(optimized_lines)
 
     total_time = time.time() - start_time
     print(f"Total time: {total_time:.2f}s")
@@ -1,5 +1,8 @@
 import re
+import os
 import sys
+from itertools import islice
+from multiprocessing import Pool
 
 """
 G-code Scaling Utility
@@ -9,108 +12,104 @@ while maintaining aspect ratio and positioning the result in the bottom-left cor
 
 How it works:
 1. Reads input G-code file and extracts current dimensions
-2. Normalizes coordinates (shifts to positive quadrant if needed)
+2. Works out the shift to the positive quadrant if needed (normalization)
 3. Calculates scaling factor based on maximum allowed X/Y dimensions
-4. Applies scaling and positions the model in the bottom-left corner
+4. Applies scaling and the shift in one pass, positioning the model in the bottom-left corner
 5. Saves result to a specified output file or with 'scaled_' prefix if not specified
+
+The scaling can also be run in-process with process(lines, max_x, max_y).
 """
 
+COORD_RE = re.compile(r'([XY])(-?\d+\.?\d*)')
+WRITE_CHUNK_LINES = 8192  # Output lines joined into a single write
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024  # Smaller files are not worth starting worker processes for
+
+worker_transform = None  # (scale_factor, x_offset, y_offset) in a worker process
+
 def parse_arguments():
-    if len(sys.argv) < 4 or len(sys.argv) > 5:
-        print("Usage: python scale_gcode.py <input_file> <max_x> <max_y> [output_file]")
+    args = sys.argv[1:]
+    # -q (or --quiet) turns off the progress output
+    verbose = True
+    for flag in ('-q', '--quiet'):
+        while flag in args:
+            args.remove(flag)
+            verbose = False
+    if len(args) < 3 or len(args) > 4:
+        print("Usage: python scale_gcode.py [-q] <input_file> <max_x> <max_y> [output_file]")
         sys.exit(1)
-    input_file = sys.argv[1]
-    max_x = float(sys.argv[2])
-    max_y = float(sys.argv[3])
-    output_file = sys.argv[4] if len(sys.argv) == 5 else f"scaled_{input_file}"
-    return input_file, max_x, max_y, output_file
-
-def read_gcode(filename):
-    with open(filename, 'r') as f:
-        return f.readlines()
+    input_file = args[0]
+    max_x = float(args[1])
+    max_y = float(args[2])
+    output_file = args[3] if len(args) == 4 else f"scaled_{input_file}"
+    return input_file, max_x, max_y, output_file, verbose
 
 def extract_dimensions(gcode_lines):
-    x_vals, y_vals = [], []
-    pattern = re.compile(r'([XY])(-?\d+\.?\d*)')
+    # The last X/Y word of each line is kept as text, the values are converted in one go
+    x_strs, y_strs = [], []
+    findall = COORD_RE.findall
     
     for line in gcode_lines:
-        matches = pattern.findall(line)
         x, y = None, None
-        for axis, value in matches:
+        for axis, value in findall(line):
             if axis == 'X':
-                x = float(value)
-            elif axis == 'Y':
-                y = float(value)
+                x = value
+            else:
+                y = value
         if x is not None:
-            x_vals.append(x)
+            x_strs.append(x)
         if y is not None:
-            y_vals.append(y)
+            y_strs.append(y)
     
-    if not x_vals or not y_vals:
-        print("Error: X and/or Y coordinates not found in G-code")
-        sys.exit(1)
+    if not x_strs or not y_strs:
+        raise ValueError("X and/or Y coordinates not found in G-code")
     
+    x_vals = list(map(float, x_strs))
+    y_vals = list(map(float, y_strs))
     return min(x_vals), max(x_vals), min(y_vals), max(y_vals)
 
-def normalize_coordinates(gcode_lines, x_offset, y_offset):
-    normalized_lines = []
-    coord_pattern = re.compile(r'([XY])(-?\d+\.?\d*)')
-    
-    for line in gcode_lines:
-        def normalize_match(match):
-            axis = match.group(1)
-            value = float(match.group(2))
-            if axis == 'X':
-                new_val = value + x_offset
-            else:
-                new_val = value + y_offset
-            return f"{axis}{new_val:.6f}"
-        
-        normalized_line = coord_pattern.sub(normalize_match, line)
-        normalized_lines.append(normalized_line)
-    
-    return normalized_lines
-
 def scale_gcode(gcode_lines, scale_factor, x_offset, y_offset):
-    scaled_lines = []
-    coord_pattern = re.compile(r'([XY])(-?\d+\.?\d*)')
+    """Yields the lines with X/Y values scaled and offset"""
+    split = COORD_RE.split
     
     for line in gcode_lines:
-        def scale_match(match):
-            axis = match.group(1)
-            value = float(match.group(2))
-            if axis == 'X':
+        # split gives [text, axis, value, text, axis, value, ..., text], so the values are
+        # replaced in place without a Python callback per match
+        parts = split(line)
+        if len(parts) == 1:
+            yield line
+            continue
+        for k in range(1, len(parts), 3):
+            value = float(parts[k+1])
+            if parts[k] == 'X':
                 new_val = value * scale_factor + x_offset
             else:
                 new_val = value * scale_factor + y_offset
-            return f"{axis}{new_val:.6f}"
-        
-        scaled_line = coord_pattern.sub(scale_match, line)
-        scaled_lines.append(scaled_line)
-    
-    return scaled_lines
+            parts[k+1] = f"{new_val:.6f}"
+        yield ''.join(parts)
 
-def main():
-    input_file, max_x, max_y, output_file = parse_arguments()
-    gcode_lines = read_gcode(input_file)
-    
-    min_x, max_x_orig, min_y, max_y_orig = extract_dimensions(gcode_lines)
+def scale_transform(dimensions, max_x, max_y, verbose=True):
+    """
+    Returns (scale_factor, x_offset, y_offset) fitting the extracted dimensions to max_x x max_y.
+    The steps are printed unless verbose is False.
+    """
+    max_x = float(max_x)
+    max_y = float(max_y)
+    min_x, max_x_orig, min_y, max_y_orig = dimensions
     
-    # Normalize coordinates (make all positive)
-    x_offset = -min_x if min_x < 0 else 0
-    y_offset = -min_y if min_y < 0 else 0
+    # Normalize coordinates (make all positive). The shift is folded into the scaling pass,
+    # it does not change the model size
+    x_shift = -min_x if min_x < 0 else 0
+    y_shift = -min_y if min_y < 0 else 0
     
-    if x_offset != 0 or y_offset != 0:
-        print(f"Normalizing coordinates: X offset {x_offset:.2f}, Y offset {y_offset:.2f}")
-        gcode_lines = normalize_coordinates(gcode_lines, x_offset, y_offset)
-        # Update boundaries after normalization
-        min_x, max_x_orig, min_y, max_y_orig = extract_dimensions(gcode_lines)
+    if verbose and (x_shift != 0 or y_shift != 0):
+        print(f"Normalizing coordinates: X offset {x_shift:.2f}, Y offset {y_shift:.2f}")
     
     width_orig = max_x_orig - min_x
     height_orig = max_y_orig - min_y
 
-    print(f"Normalized model dimensions: {width_orig:.2f} x {height_orig:.2f}")
-    print(f"Machine maximum dimensions: {max_x:.2f} x {max_y:.2f}")
+    if verbose:
+        print(f"Normalized model dimensions: {width_orig:.2f} x {height_orig:.2f}")
+        print(f"Machine maximum dimensions: {max_x:.2f} x {max_y:.2f}")
 
     scale_x = max_x / width_orig
     scale_y = max_y / height_orig
@@ -118,20 +117,61 @@ def main():
 
     new_width = width_orig * scale_factor
     new_height = height_orig * scale_factor
-    # Position in bottom-left corner
-    x_offset = 0  # Left edge (X=0)
-    y_offset = 0  # Bottom edge (Y=0)
+    # Position in bottom-left corner: only the normalization shift, scaled
+    x_offset = x_shift * scale_factor  # Left edge (X=0)
+    y_offset = y_shift * scale_factor  # Bottom edge (Y=0)
+
+    if verbose:
+        print(f"Scaling factor: {scale_factor:.6f}")
+        print(f"New dimensions: {new_width:.2f} x {new_height:.2f}")
+        # x_offset/y_offset only undo the normalization, the scaled model ends up at the origin
+        print("Position: Bottom-left corner (X offset: 0.00, Y offset: 0.00)")
 
-    print(f"Scaling factor: {scale_factor:.6f}")
-    print(f"New dimensions: {new_width:.2f} x {new_height:.2f}")
-    print(f"Position: Bottom-left corner (X offset: {x_offset:.2f}, Y offset: {y_offset:.2f})")
+    return scale_factor, x_offset, y_offset
 
-    scaled_gcode = scale_gcode(gcode_lines, scale_factor, x_offset, y_offset)
+def process(gcode_lines, max_x, max_y):
+    """Scales G-code lines to fit max_x x max_y, returns the scaled lines"""
+    transform = scale_transform(extract_dimensions(gcode_lines), max_x, max_y)
+    return list(scale_gcode(gcode_lines, *transform))
+
+def init_worker(transform):
+    global worker_transform
+    worker_transform = transform
+
+def scale_chunk(lines):
+    """Worker side of main: scales a chunk of lines and returns them joined"""
+    return ''.join(scale_gcode(lines, *worker_transform))
+
+def main():
+    input_file, max_x, max_y, output_file, verbose = parse_arguments()
     
-    with open(output_file, 'w') as f:
-        f.writelines(scaled_gcode)
+    # Stream the file twice (dimensions, then rewrite) instead of holding it in memory
+    with open(input_file, 'r') as f:
+        try:
+            transform = scale_transform(extract_dimensions(f), max_x, max_y, verbose)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        f.seek(0)
+        
+        with open(output_file, 'w') as fout:
+            # Lines scale independently once the transform is known, so large files are
+            # split into chunks for worker processes, written back in order
+            if (os.cpu_count() or 1) > 1 and os.path.getsize(input_file) >= PARALLEL_MIN_BYTES:
+                chunks = iter(lambda: list(islice(f, WRITE_CHUNK_LINES)), [])
+                with Pool(initializer=init_worker, initargs=(transform,)) as pool:
+                    for chunk in pool.imap(scale_chunk, chunks):
+                        fout.write(chunk)
+            else:
+                out = scale_gcode(f, *transform)
+                while True:
+                    chunk = ''.join(islice(out, WRITE_CHUNK_LINES))
+                    if not chunk:
+                        break
+                    fout.write(chunk)
     
-    print(f"Scaling completed. Result saved to {output_file}")
+    if verbose:
+        print(f"Scaling completed. Result saved to {output_file}")
 
 if __name__ == "__main__":
     main()